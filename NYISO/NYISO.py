@@ -4,8 +4,15 @@ import os
 import zipfile
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
 from datetime import datetime
 
+# Shared modules of the chronosForecaster folder, importable with PYTHONPATH=../chronosForecaster (see README)
+from timestamps import NAT, epochs_to_datetime, parse_timestamps
+from rollups import choose_tier, select_tier
+
 # === Configuration ===
 data_folder = 'NYiso'  # Set to your zip data folder
 os.makedirs('output_plots', exist_ok=True)
@@ -23,7 +30,7 @@ def read_csv_from_zip(zip_path):
                                 try:
                                     f.seek(0)
                                     df = pd.read_csv(f,
-                                                     usecols=['Time Stamp', 'Integrated Load'],
+                                                     usecols=lambda col: col in ['Time Stamp', 'Time Zone', 'Integrated Load'],
                                                      encoding=encoding,
                                                      on_bad_lines='warn')
                                     if all(col in df.columns for col in ['Time Stamp', 'Integrated Load']):
@@ -46,8 +53,18 @@ for zip_file in os.listdir(data_folder):
 
 df = pd.concat(all_dfs, ignore_index=True)
 df.dropna(subset=['Integrated Load'], inplace=True)
-df['Time Stamp'] = pd.to_datetime(df['Time Stamp'], errors='coerce')
-df.dropna(subset=['Time Stamp'], inplace=True)
+# Time stamps are Eastern wall times: each distinct string is parsed once, the repeated hour when clocks fall back
+# is resolved with the Time Zone column (EST, else EDT) and hours skipped in spring are shifted forward
+if 'Time Zone' in df.columns:
+    ambiguous = df['Time Zone'].ne('EST').to_numpy()
+else:
+    ambiguous = 'earliest'
+epochs = parse_timestamps(df['Time Stamp'], timezone='America/New_York', ambiguous=ambiguous,
+                          nonexistent='shift_forward')
+df = df[epochs != NAT].copy()
+utc_times = epochs_to_datetime(epochs[epochs != NAT])
+# The outputs keep the naive Eastern wall times they have always had
+df['Time Stamp'] = utc_times.tz_convert('America/New_York').tz_localize(None)
 
 # === Step 2: Time Features ===
 df['Year'] = df['Time Stamp'].dt.year
@@ -124,3 +141,28 @@ peak_counts_by_year.to_csv('smart_peak_counts_by_year.csv', index=False)
 print("Peak counts by year:")
 print(peak_counts_by_year.to_string(index=False))
 print("- Saved as 'smart_peak_counts_by_year.csv'")
+
+# === Step 9: Plot Load Against the Adjusted Thresholds ===
+# The load is drawn from the finest rollup tier under 5,000 points (daily for a decade of hourly rows) with its
+# min-max band, so the peaks stay visible without drawing every hourly row
+load = pd.DataFrame({'timestamp': utc_times, 'value': df['Integrated Load'].to_numpy()})
+tier = choose_tier(load['timestamp'].min(), load['timestamp'].max(), max_points=5000)
+rollup = select_tier(load, tier)
+month_starts = pd.to_datetime(pd.DataFrame({'year': monthly_thresholds['Year'], 'month': monthly_thresholds['Month'],
+                                            'day': 1})).dt.tz_localize('America/New_York')
+
+plt.figure(figsize=(14, 6))
+plt.fill_between(rollup['timestamp'], rollup['min'], rollup['max'], color='gray', alpha=0.3,
+                 label=f'Integrated Load ({tier} min-max)')
+plt.plot(rollup['timestamp'], rollup['mean'], color='black', linewidth=1, label=f'Integrated Load ({tier} mean)')
+plt.step(month_starts, monthly_thresholds['AdjustedThreshold'], where='post', color='red',
+         label='Adjusted Threshold')
+plt.title('Integrated Load and Monthly Peak Thresholds')
+plt.xlabel('Time Stamp')
+plt.ylabel('Integrated Load')
+plt.legend()
+plt.grid(True)
+plt.tight_layout()
+plt.savefig(os.path.join('output_plots', 'load_and_thresholds.png'))
+plt.close()
+print("- Saved plot as 'output_plots/load_and_thresholds.png'")
@@ -0,0 +1,430 @@
+"""Batched and sharded walk-forward backtesting for Chronos predictors."""
+import contextlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from autogluon.timeseries import TimeSeriesDataFrame, TimeSeriesPredictor
+
+
+class ForecastBatch:
+    """Forecasts for a batch of (item, origin) pairs returned by a single predict call."""
+
+    def __init__(self, item_ids, start_times, mean, quantiles=None, quantile_levels=()):
+        """Inits a forecast batch.
+
+        Args:
+            item_ids (np.ndarray): Item id of each forecast origin.
+            start_times (pd.DatetimeIndex): UTC timestamp of the first forecast step of each origin.
+            mean (np.ndarray): Mean forecast, shape (n_origins, prediction_length).
+            quantiles (Optional[np.ndarray]): Quantile forecasts, shape (n_origins, prediction_length, n_quantiles).
+            quantile_levels (Sequence[float]): Levels of the quantile forecasts.
+        """
+        self.item_ids = item_ids
+        self.start_times = start_times
+        self.mean = mean
+        self.quantiles = quantiles
+        self.quantile_levels = tuple(quantile_levels)
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def to_frame(self):
+        """Returns the batch in the wide walk-forward format (item_id, start_time, target_1..target_N).
+
+        Returns:
+            pd.DataFrame: One row per forecast origin.
+        """
+        df = pd.DataFrame(self.mean, columns=[f"target_{j + 1}" for j in range(self.mean.shape[1])])
+        df.insert(0, "start_time", self.start_times)
+        df.insert(0, "item_id", self.item_ids)
+        return df
+
+
+def get_origins(timestamps, test_start_dt, test_end_dt, prediction_length):
+    """Returns the positional forecast origins of a series inside the test window.
+
+    Args:
+        timestamps (pd.DatetimeIndex): Timezone-naive timestamps of the series.
+        test_start_dt (datetime): First forecast origin.
+        test_end_dt (datetime): End of the test window; the last forecast must end before it.
+        prediction_length (int): Number of steps forecast at each origin.
+
+    Returns:
+        range: Positions `i` such that the context is everything before position `i`.
+    """
+    test_start_idx = timestamps.get_loc(test_start_dt)
+    test_end_idx = timestamps.get_loc(test_end_dt)
+    return range(test_start_idx, test_end_idx - prediction_length + 1)
+
+
+def get_series_arrays(ts_data, target="site"):
+    """Extracts each item's timestamps and target values as contiguous NumPy arrays.
+
+    Args:
+        ts_data (TimeSeriesDataFrame): Full history of all items.
+        target (str): Name of the target column.
+
+    Returns:
+        Dict[Any, Tuple[pd.DatetimeIndex, np.ndarray]]: Timestamps and contiguous float64 values per item id.
+    """
+    series = {}
+    for item_id in ts_data.item_ids:
+        target_series = ts_data.loc[item_id][target]
+        series[item_id] = (target_series.index, np.ascontiguousarray(target_series.to_numpy(dtype=np.float64)))
+    return series
+
+
+def build_context(series, pairs, max_context_length=None, target="site"):
+    """Packs the contexts of many (item, origin) pairs into one TimeSeriesDataFrame.
+
+    Each context is a view `values[start:i]` of the item's preallocated arrays, copied once into the
+    batch buffer, so the cost of a context does not depend on how much history precedes it.
+
+    Args:
+        series (Dict[Any, Tuple[pd.DatetimeIndex, np.ndarray]]): Output of `get_series_arrays`.
+        pairs (List[Tuple[Any, int]]): (item_id, origin position) pairs; the position in the list becomes
+            the synthetic item id.
+        max_context_length (Optional[int]): Maximum number of past steps given to the model. Unbounded if None.
+        target (str): Name of the target column.
+
+    Returns:
+        TimeSeriesDataFrame: Contexts with synthetic item ids 0..len(pairs) - 1.
+    """
+    bounds = []
+    for item_id, i in pairs:
+        start = 0 if max_context_length is None else max(0, i - max_context_length)
+        bounds.append((item_id, start, i))
+    lengths = np.array([i - start for _, start, i in bounds])
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+    values = np.empty(offsets[-1], dtype=np.float64)
+    timestamps = np.empty(offsets[-1], dtype=series[pairs[0][0]][0].dtype)
+    for n, (item_id, start, i) in enumerate(bounds):
+        item_timestamps, item_values = series[item_id]
+        values[offsets[n]:offsets[n + 1]] = item_values[start:i]
+        timestamps[offsets[n]:offsets[n + 1]] = item_timestamps.values[start:i]
+
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(np.arange(len(pairs)), lengths), timestamps], names=["item_id", "timestamp"]
+    )
+    return TimeSeriesDataFrame(pd.DataFrame({target: values}, index=index))
+
+
+def get_forecast_pairs(series, test_start_dt, test_end_dt, prediction_length, completed=None, selected_origins=None):
+    """Lists every (item, origin) pair of the walk-forward test window.
+
+    Args:
+        series (Dict[Any, Tuple[pd.DatetimeIndex, np.ndarray]]): Output of `get_series_arrays`.
+        test_start_dt (datetime): First forecast origin.
+        test_end_dt (datetime): End of the test window.
+        prediction_length (int): Number of steps forecast at each origin.
+        completed (Optional[Set[Tuple[Any, pd.Timestamp]]]): (item_id, UTC start_time) pairs to skip,
+            e.g. `ForecastLog.completed()` of a resumed run.
+        selected_origins (Optional[pd.DatetimeIndex]): UTC origins to forecast, e.g. from
+            `origin_sampling.sample_origins`. Every origin of the test window if None.
+
+    Returns:
+        List[Tuple[Any, int]]: (item_id, origin position) pairs, ordered by item then origin.
+    """
+    pairs = []
+    for item_id, (timestamps, _) in series.items():
+        try:
+            origins = get_origins(timestamps, test_start_dt, test_end_dt, prediction_length)
+        except KeyError:
+            print(f"[WARNING] Item {item_id} does not have data for test range. Skipping.")
+            continue
+        if selected_origins is not None:
+            origins = np.asarray(origins)[timestamps[origins].tz_localize("UTC").isin(selected_origins)]
+        if completed:
+            start_times = timestamps[origins].tz_localize("UTC")
+            origins = [i for i, start in zip(origins, start_times) if (item_id, start) not in completed]
+        pairs.extend((item_id, i) for i in origins)
+    return pairs
+
+
+def predict_pairs(
+    predictor,
+    series,
+    pairs,
+    prediction_length,
+    batch_size=64,
+    max_context_length=None,
+    target="site",
+    profiler=None,
+):
+    """Forecasts the given (item, origin) pairs, `batch_size` contexts per predict call.
+
+    Every context is given a synthetic item id so that a whole batch is forecast by one
+    `predictor.predict` call. The results are mapped back to (item, origin).
+
+    Args:
+        predictor (TimeSeriesPredictor): Trained predictor.
+        series (Dict[Any, Tuple[pd.DatetimeIndex, np.ndarray]]): Output of `get_series_arrays`.
+        pairs (List[Tuple[Any, int]]): (item_id, origin position) pairs to forecast.
+        prediction_length (int): Number of steps forecast at each origin.
+        batch_size (int): Number of contexts forecast per predict call.
+        max_context_length (Optional[int]): Maximum number of past steps given to the model. Unbounded if None.
+        target (str): Name of the target column.
+        profiler (Optional[Profiler]): If given, every predict call is recorded as a "predict batch" span.
+
+    Yields:
+        ForecastBatch: Forecasts of one predict call.
+    """
+    for batch_start in range(0, len(pairs), batch_size):
+        batch = pairs[batch_start:batch_start + batch_size]
+        ts_context = build_context(series, batch, max_context_length=max_context_length, target=target)
+
+        span = profiler.span("predict batch", size=len(batch)) if profiler is not None else contextlib.nullcontext()
+        try:
+            with span:
+                pred = predictor.predict(ts_context)
+        except Exception as e:
+            print(f"[ERROR] Forecasting failed for batch starting at item {batch[0][0]} step {batch[0][1]}: {e}")
+            continue
+
+        # Predictions come back grouped by synthetic item id, prediction_length rows each
+        synthetic_ids = pred.index.get_level_values("item_id")[::prediction_length]
+        order = np.argsort(np.asarray(synthetic_ids))
+        mean = pred["mean"].to_numpy().reshape(-1, prediction_length)
+        quantile_columns = [column for column in pred.columns if column != "mean"]
+        quantiles = pred[quantile_columns].to_numpy().reshape(-1, prediction_length, len(quantile_columns))
+        yield ForecastBatch(
+            item_ids=np.array([item_id for item_id, _ in batch]),
+            start_times=pd.DatetimeIndex([series[item_id][0][i] for item_id, i in batch]).tz_localize("UTC"),
+            mean=mean[order],
+            quantiles=quantiles[order],
+            quantile_levels=[float(column) for column in quantile_columns],
+        )
+
+
+def iter_walk_forward(
+    predictor,
+    ts_data,
+    test_start_dt,
+    test_end_dt,
+    prediction_length,
+    batch_size=64,
+    max_context_length=None,
+    completed=None,
+    target="site",
+    profiler=None,
+    selected_origins=None,
+):
+    """Runs a walk-forward forecast over all items, packing many origins into each predict call.
+
+    Args:
+        predictor (TimeSeriesPredictor): Trained predictor.
+        ts_data (TimeSeriesDataFrame): Full history of all items.
+        test_start_dt (datetime): First forecast origin.
+        test_end_dt (datetime): End of the test window.
+        prediction_length (int): Number of steps forecast at each origin.
+        batch_size (int): Number of contexts forecast per predict call.
+        max_context_length (Optional[int]): Maximum number of past steps given to the model. Unbounded if None.
+        completed (Optional[Set[Tuple[Any, pd.Timestamp]]]): (item_id, UTC start_time) pairs to skip.
+        target (str): Name of the target column.
+        profiler (Optional[Profiler]): If given, every predict call is recorded as a "predict batch" span.
+        selected_origins (Optional[pd.DatetimeIndex]): UTC origins to forecast. Every origin if None.
+
+    Yields:
+        ForecastBatch: Forecasts of one predict call.
+    """
+    series = get_series_arrays(ts_data, target=target)
+    pairs = get_forecast_pairs(series, test_start_dt, test_end_dt, prediction_length, completed=completed,
+                               selected_origins=selected_origins)
+    yield from predict_pairs(
+        predictor,
+        series,
+        pairs,
+        prediction_length,
+        batch_size=batch_size,
+        max_context_length=max_context_length,
+        target=target,
+        profiler=profiler,
+    )
+
+
+def walk_forward(
+    predictor,
+    ts_data,
+    test_start_dt,
+    test_end_dt,
+    prediction_length,
+    batch_size=64,
+    max_context_length=None,
+    log=None,
+    on_batch=None,
+    target="site",
+    profiler=None,
+    selected_origins=None,
+):
+    """Runs a batched walk-forward forecast and collects it into one wide DataFrame.
+
+    Args:
+        predictor (TimeSeriesPredictor): Trained predictor.
+        ts_data (TimeSeriesDataFrame): Full history of all items.
+        test_start_dt (datetime): First forecast origin.
+        test_end_dt (datetime): End of the test window.
+        prediction_length (int): Number of steps forecast at each origin.
+        batch_size (int): Number of contexts forecast per predict call.
+        max_context_length (Optional[int]): Maximum number of past steps given to the model. Unbounded if None.
+        log (Optional[ForecastLog]): If given, every batch is streamed to the log instead of being kept in
+            memory, and pairs already in the log are skipped.
+        on_batch (Optional[Callable[[ForecastBatch], None]]): Called with every batch as soon as it is forecast,
+            e.g. `OnlineEvaluator.update`.
+        target (str): Name of the target column.
+        profiler (Optional[Profiler]): If given, every predict call is recorded as a "predict batch" span.
+        selected_origins (Optional[pd.DatetimeIndex]): UTC origins to forecast, e.g. an hourly stride or a
+            stratified sample from `origin_sampling.sample_origins`. Every origin if None.
+
+    Returns:
+        Union[pd.DataFrame, ForecastLog]: Walk-forward forecasts with columns item_id, start_time,
+            target_1..target_N, or `log` holding them if one was given.
+    """
+    frames = []
+    with log if log is not None else contextlib.nullcontext():
+        for batch in iter_walk_forward(
+            predictor,
+            ts_data,
+            test_start_dt,
+            test_end_dt,
+            prediction_length,
+            batch_size=batch_size,
+            max_context_length=max_context_length,
+            completed=log.completed() if log is not None else None,
+            target=target,
+            profiler=profiler,
+            selected_origins=selected_origins,
+        ):
+            if on_batch is not None:
+                on_batch(batch)
+            if log is not None:
+                log.append(batch.to_frame())
+            else:
+                frames.append(batch.to_frame())
+
+    # The log is handed back unread; `log.iter_parts()` streams it and `log.read()` loads it whole
+    if log is not None:
+        return log
+    return concat_forecast_frames(frames, prediction_length)
+
+
+def concat_forecast_frames(frames, prediction_length):
+    """Concatenates wide walk-forward frames, returning an empty frame with the right columns if there are none.
+
+    Args:
+        frames (List[pd.DataFrame]): Wide walk-forward frames.
+        prediction_length (int): Number of steps forecast at each origin.
+
+    Returns:
+        pd.DataFrame: Walk-forward forecasts with columns item_id, start_time, target_1..target_N.
+    """
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=["item_id", "start_time"] + [f"target_{j + 1}" for j in range(prediction_length)])
+    return pd.concat(frames, ignore_index=True)
+
+
+# ========== Sharded, process-parallel walk-forward ==========
+# State of a worker process, set once by `_init_worker`.
+_worker = {}
+
+
+def _init_worker(predictor_path, series, threads_per_worker, forecast_kwargs):
+    import torch
+
+    torch.set_num_threads(threads_per_worker)
+    _worker["predictor"] = TimeSeriesPredictor.load(predictor_path)
+    _worker["series"] = series
+    _worker["forecast_kwargs"] = forecast_kwargs
+
+
+def _run_shard(pairs):
+    return list(predict_pairs(_worker["predictor"], _worker["series"], pairs, **_worker["forecast_kwargs"]))
+
+
+def sharded_walk_forward(
+    predictor_path,
+    ts_data,
+    test_start_dt,
+    test_end_dt,
+    prediction_length,
+    num_workers=None,
+    threads_per_worker=1,
+    shard_size=512,
+    batch_size=64,
+    max_context_length=None,
+    log=None,
+    on_batch=None,
+    target="site",
+    selected_origins=None,
+):
+    """Runs a walk-forward forecast with the (item, origin) space split across a process pool.
+
+    Each worker loads the saved predictor once and forecasts whole shards of consecutive pairs.
+    Shard results are merged in (item, origin) order, so the output does not depend on which worker
+    finishes first. Workers are spawned, so this must be called from under an
+    `if __name__ == "__main__":` guard.
+
+    Args:
+        predictor_path (str): Directory of a saved TimeSeriesPredictor.
+        ts_data (TimeSeriesDataFrame): Full history of all items.
+        test_start_dt (datetime): First forecast origin.
+        test_end_dt (datetime): End of the test window.
+        prediction_length (int): Number of steps forecast at each origin.
+        num_workers (Optional[int]): Number of worker processes. Defaults to `os.cpu_count() // threads_per_worker`.
+        threads_per_worker (int): Torch thread budget of each worker.
+        shard_size (int): Number of (item, origin) pairs per shard.
+        batch_size (int): Number of contexts forecast per predict call.
+        max_context_length (Optional[int]): Maximum number of past steps given to the model. Unbounded if None.
+        log (Optional[ForecastLog]): If given, every finished shard is streamed to the log, and pairs already
+            in the log are skipped.
+        on_batch (Optional[Callable[[ForecastBatch], None]]): Called with every batch of a shard as soon as the
+            shard finishes, e.g. `OnlineEvaluator.update`.
+        target (str): Name of the target column.
+        selected_origins (Optional[pd.DatetimeIndex]): UTC origins to forecast. Every origin if None.
+
+    Returns:
+        Union[pd.DataFrame, ForecastLog]: Walk-forward forecasts with columns item_id, start_time,
+            target_1..target_N, or `log` holding them if one was given.
+    """
+    if num_workers is None:
+        num_workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    series = get_series_arrays(ts_data, target=target)
+    completed = log.completed() if log is not None else None
+    pairs = get_forecast_pairs(series, test_start_dt, test_end_dt, prediction_length, completed=completed,
+                               selected_origins=selected_origins)
+    shards = [pairs[k:k + shard_size] for k in range(0, len(pairs), shard_size)]
+    forecast_kwargs = {
+        "prediction_length": prediction_length,
+        "batch_size": batch_size,
+        "max_context_length": max_context_length,
+        "target": target,
+    }
+
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(predictor_path, series, threads_per_worker, forecast_kwargs),
+    ) as executor, log if log is not None else contextlib.nullcontext():
+        futures = {executor.submit(_run_shard, shard): k for k, shard in enumerate(shards)}
+        frames = [None] * len(shards)
+        for future in as_completed(futures):
+            batches = future.result()
+            if on_batch is not None:
+                for batch in batches:
+                    on_batch(batch)
+            shard_frame = concat_forecast_frames([batch.to_frame() for batch in batches], prediction_length)
+            if log is not None:
+                log.append(shard_frame)
+            else:
+                frames[futures[future]] = shard_frame
+
+    # The log is handed back unread; `log.iter_parts()` streams it and `log.read()` loads it whole
+    if log is not None:
+        return log
+    return concat_forecast_frames(frames, prediction_length)
@@ -0,0 +1,85 @@
+# This script backtests the baseline forecasters on every site and walk-forward origin: seasonal naive (same interval
+# one day and one week back), the average of the same interval over the past week, and exponential smoothing of each
+# time of day over the days. All baselines run as array operations over every site and origin at once, so a fleet
+# backtest takes seconds and gives a floor for Chronos and the in-house Forecaster. Origins can be thinned to a stride,
+# fixed times of day or a stratified sample, and per-site errors are reported with bootstrap confidence intervals.
+# `--mask-quality` drops intervals flagged by data_quality.py from the baseline history and from the scores.
+#
+# Example:
+#   python baselineBacktest.py --test-start 2024-12-01 --test-end 2025-01-03 --origin-stride 1h --origins-per-stratum 24
+import argparse
+import os
+import time
+from datetime import datetime
+
+from baselines import BASELINES, baseline_forecasts
+from data_quality import FLAGS, flag_bits, mask_sites
+from dataset import SITE_FILES, load_sites
+from metrics import bootstrap_errors, errors_by_item, errors_by_step, gather_actuals
+from origin_sampling import candidate_origins, sample_origins, stratum_weights
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorized walk-forward backtest of baseline forecasters.")
+    parser.add_argument("--files", nargs="+", default=SITE_FILES, help="Site dataset CSVs")
+    parser.add_argument("--output-dir", default="output-baselines")
+    parser.add_argument("--test-start", default="2025-01-01", help="First forecast origin (YYYY-MM-DD)")
+    parser.add_argument("--test-end", default="2025-01-03", help="End of the test window (YYYY-MM-DD)")
+    parser.add_argument("--prediction-length", type=int, default=96)
+    parser.add_argument("--methods", nargs="+", choices=list(BASELINES), default=list(BASELINES))
+    parser.add_argument("--origin-stride", default=None, help="Forecast only origins on this stride, e.g. 1h")
+    parser.add_argument("--origin-times", nargs="+", default=None, help="Forecast only these local times, e.g. 06:00")
+    parser.add_argument("--origins-per-stratum", type=int, default=None,
+                        help="Sample at most this many origins per month, weekday/weekend and peak/off-peak stratum")
+    parser.add_argument("--timezone", default="America/Chicago", help="Local timezone of the origin options")
+    parser.add_argument("--mask-quality", nargs="+", default=None, choices=["bad", *FLAGS],
+                        help="Data-quality flags whose intervals are dropped from the history and the scores")
+    parser.add_argument("--bootstrap-resamples", type=int, default=1000,
+                        help="Resamples of the metric confidence intervals, 0 to skip them")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the metric intervals")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    os.makedirs(args.output_dir, exist_ok=True)
+    actual_df = load_sites(args.files, columns=("site",)).rename(columns={"site": "actual"})
+    if args.mask_quality:
+        actual_df = mask_sites(actual_df, args.files, flag_bits(args.mask_quality), value_column="actual")
+    test_start_dt = datetime.fromisoformat(args.test_start)
+    test_end_dt = datetime.fromisoformat(args.test_end)
+
+    candidates = candidate_origins(test_start_dt, test_end_dt, args.prediction_length)
+    origins = sample_origins(candidates, stride=args.origin_stride, times_of_day=args.origin_times,
+                             per_stratum=args.origins_per_stratum, timezone=args.timezone)
+    print(f"{len(origins)} of {len(candidates)} origins selected.")
+
+    tensors = baseline_forecasts(
+        actual_df,
+        test_start_dt,
+        test_end_dt,
+        args.prediction_length,
+        methods=args.methods,
+        selected_origins=origins,
+    )
+    print(f"Baseline forecasts done in {time.time() - start_time:.2f} seconds.")
+
+    step_errors, item_errors, ci_errors = None, None, None
+    for name, tensor in tensors.items():
+        # Same wide format as the Chronos walk-forward (item_id, start_time, target_1..target_N)
+        tensor.to_frame().to_parquet(os.path.join(args.output_dir, f"walk_forward_{name}.parquet"), index=False)
+        actuals = gather_actuals(tensor, actual_df)
+        steps = errors_by_step(tensor, actuals, name)
+        items = errors_by_item(tensor, actuals, name)
+        step_errors = steps if step_errors is None else step_errors.merge(steps, on=["item_id", "step"])
+        item_errors = items if item_errors is None else item_errors.merge(items, on="item_id")
+        if args.bootstrap_resamples:
+            # Sampled origins are weighted by how many candidate origins of their stratum they stand for
+            weights = stratum_weights(tensor.origins, candidates, args.timezone)
+            ci = bootstrap_errors(tensor, actuals, name, weights=weights, n_resamples=args.bootstrap_resamples,
+                                  confidence=args.confidence)
+            ci_errors = ci if ci_errors is None else ci_errors.merge(ci.drop(columns="count"), on="item_id")
+
+    step_errors.to_csv(os.path.join(args.output_dir, "errors_by_step_baselines.csv"), index=False)
+    item_errors.to_csv(os.path.join(args.output_dir, "errors_by_item_baselines.csv"), index=False)
+    if ci_errors is not None:
+        ci_errors.to_csv(os.path.join(args.output_dir, "errors_by_item_ci_baselines.csv"), index=False)
+    print(item_errors[["item_id", *[f"mae_{name}" for name in tensors]]].to_string(index=False))
+    print(f"Total script runtime: {time.time() - start_time:.2f} seconds")
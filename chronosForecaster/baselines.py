@@ -0,0 +1,142 @@
+"""Vectorized baseline forecasts of every item and origin: seasonal naive, rolling profile and exponential smoothing."""
+import numpy as np
+import pandas as pd
+
+from metrics import ForecastTensor, build_actual_grid
+from origin_sampling import candidate_origins
+
+DAY_STEPS = 96  # 15-minute intervals per day
+WEEK_STEPS = 7 * DAY_STEPS
+
+
+def _by_season(grid, season):
+    """Reshapes an (item, time) grid to (item, n_seasons, season), padding the end with NaN."""
+    n_items, length = grid.shape
+    n_seasons = -(-length // season)
+    padded = np.full((n_items, n_seasons * season), np.nan)
+    padded[:, :length] = grid
+    return padded.reshape(n_items, n_seasons, season)
+
+
+def profile_levels(grid, season=DAY_STEPS, window=7):
+    """Averages every interval with the same slot of the previous `window - 1` seasons.
+
+    Args:
+        grid (np.ndarray): Actuals, shape (n_items, n_steps). Missing intervals are NaN and skipped.
+        season (int): Steps per season, e.g. 96 for the time of day.
+        window (int): Number of seasons averaged.
+
+    Returns:
+        np.ndarray: Level of every interval from data up to and including it, same shape as `grid`.
+    """
+    by_season = _by_season(grid, season)
+    observed = ~np.isnan(by_season)
+    totals = np.cumsum(np.where(observed, by_season, 0.0), axis=1)
+    counts = np.cumsum(observed, axis=1)
+    totals[:, window:] -= totals[:, :-window].copy()
+    counts[:, window:] -= counts[:, :-window].copy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        levels = np.where(counts > 0, totals / counts, np.nan)
+    return levels.reshape(grid.shape[0], -1)[:, :grid.shape[1]]
+
+
+def smoothed_levels(grid, season=DAY_STEPS, alpha=0.3):
+    """Exponentially smooths every slot of a season over the seasons, e.g. each time of day over the days.
+
+    Args:
+        grid (np.ndarray): Actuals, shape (n_items, n_steps). Missing intervals keep the previous level.
+        season (int): Steps per season.
+        alpha (float): Smoothing weight of the newest observation.
+
+    Returns:
+        np.ndarray: Level of every interval from data up to and including it, same shape as `grid`.
+    """
+    by_season = _by_season(grid, season)
+    levels = np.empty_like(by_season)
+    level = by_season[:, 0].copy()
+    levels[:, 0] = level
+    # One step per season, each step updates all items and slots at once
+    for k in range(1, by_season.shape[1]):
+        value = by_season[:, k]
+        updated = np.where(np.isnan(level), value, alpha * value + (1 - alpha) * level)
+        level = np.where(np.isnan(value), level, updated)
+        levels[:, k] = level
+    return levels.reshape(grid.shape[0], -1)[:, :grid.shape[1]]
+
+
+# Name -> (season, levels of every interval); a forecast is the level of the same slot one season back
+BASELINES = {
+    "seasonal_naive_day": (DAY_STEPS, lambda grid: grid),
+    "seasonal_naive_week": (WEEK_STEPS, lambda grid: grid),
+    "rolling_profile": (DAY_STEPS, lambda grid: profile_levels(grid, DAY_STEPS, window=7)),
+    "exponential_smoothing": (DAY_STEPS, lambda grid: smoothed_levels(grid, DAY_STEPS, alpha=0.3)),
+}
+
+
+def seasonal_forecast(levels, origin_positions, prediction_length, season):
+    """Forecasts every step with the level of the latest interval of the same slot before the origin.
+
+    Args:
+        levels (np.ndarray): Per-interval levels, shape (n_items, n_steps).
+        origin_positions (np.ndarray): Grid position of every origin; the context is everything before it.
+        prediction_length (int): Number of steps forecast at each origin.
+        season (int): Steps per season.
+
+    Returns:
+        np.ndarray: Forecasts, shape (n_items, n_origins, prediction_length). NaN before the start of the grid.
+    """
+    steps = np.arange(prediction_length)
+    # Step h (0-based) is forecast from the same slot ceil((h + 1) / season) seasons back
+    lags = season * ((steps // season) + 1)
+    positions = np.asarray(origin_positions)[:, None] + steps[None, :] - lags[None, :]
+    forecast = levels[:, np.clip(positions, 0, None)]
+    forecast[:, positions < 0] = np.nan
+    return forecast
+
+
+def baseline_forecasts(actual_df, test_start_dt, test_end_dt, prediction_length, methods=None, freq="15min",
+                       selected_origins=None):
+    """Runs baselines over every item and walk-forward origin in a few array operations.
+
+    The origins are the same as `walk_forward`: every interval from `test_start_dt` to the last one whose forecast
+    ends before `test_end_dt`.
+
+    Args:
+        actual_df (pd.DataFrame): Long actuals with columns item_id, timestamp (UTC) and actual.
+        test_start_dt (datetime): First forecast origin, UTC.
+        test_end_dt (datetime): End of the test window, UTC.
+        prediction_length (int): Number of steps forecast at each origin.
+        methods (Optional[Sequence[str]]): Names of `BASELINES` to run. All if None.
+        freq (str): Frequency of the site series.
+        selected_origins (Optional[pd.DatetimeIndex]): UTC origins to forecast, e.g. from
+            `origin_sampling.sample_origins`. Every origin of the test window if None.
+
+    Returns:
+        Dict[str, ForecastTensor]: Forecasts of every baseline; `to_frame()` gives the wide walk-forward format.
+
+    Raises:
+        ValueError: If no origin is selected, e.g. a test window shorter than the prediction length or selected
+            origins outside it.
+    """
+    freq = pd.Timedelta(freq)
+    origins = candidate_origins(test_start_dt, test_end_dt, prediction_length, freq)
+    if selected_origins is not None:
+        origins = origins[origins.isin(selected_origins)]
+    if len(origins) == 0:
+        raise ValueError(f"No forecast origins between {test_start_dt} and {test_end_dt} with a prediction length "
+                         f"of {prediction_length} steps"
+                         + (" among the selected origins" if selected_origins is not None else ""))
+
+    # Only the history before the last origin is used
+    item_ids = np.sort(pd.unique(actual_df["item_id"].to_numpy()))
+    grid_start = pd.DatetimeIndex(actual_df["timestamp"]).min().floor(freq)
+    length = int((origins[-1] - grid_start) / freq)
+    grid = build_actual_grid(actual_df, item_ids, grid_start, length, freq)
+    origin_positions = np.asarray((origins - grid_start) / freq).astype(np.int64)
+
+    tensors = {}
+    for name in methods or BASELINES:
+        season, levels = BASELINES[name]
+        values = seasonal_forecast(levels(grid), origin_positions, prediction_length, season)
+        tensors[name] = ForecastTensor(item_ids, origins, values, freq=freq)
+    return tensors
@@ -0,0 +1,218 @@
+# This script benchmarks Chronos `predictor.predict` latency and throughput on CPU.
+# It runs every combination of the given batch sizes, context lengths, item counts, prediction lengths and torch
+# thread counts, times each predict call, and writes p50/p95/p99 latency and series/s to a JSON file that can be
+# compared across runs, presets and library versions.
+#
+# Example:
+#   python benchmarkPredict.py --batch-sizes 1 16 64 --context-lengths 512 2048 --threads 1 4 --output bench.json
+import argparse
+import itertools
+import json
+import os
+import platform
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_series(n_series, length, seed=0):
+    """Builds load-like 15-minute series with daily and weekly cycles plus noise.
+
+    Args:
+        n_series (int): Number of series.
+        length (int): Number of steps per series.
+        seed (int): Seed of the noise.
+
+    Returns:
+        Dict[int, Tuple[pd.DatetimeIndex, np.ndarray]]: Timestamps and values per item id, as `get_series_arrays`.
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range("2024-01-01", periods=length, freq="15min")
+    t = np.arange(length)
+    series = {}
+    for item_id in range(n_series):
+        base = rng.uniform(50, 500)
+        values = base * (1 + 0.3 * np.sin(2 * np.pi * t / 96) + 0.1 * np.sin(2 * np.pi * t / 672))
+        series[item_id] = (timestamps, values + rng.normal(0, 0.05 * base, length))
+    return series
+
+
+def benchmark_pairs(series, n_items, context_length):
+    """Picks `n_items` (item, origin) pairs that each have `context_length` steps of history.
+
+    Items are reused round-robin with origins stepping back one step, so any number of contexts can be drawn
+    from the few bundled sites.
+    """
+    item_ids = list(series)
+    pairs = []
+    for k in range(n_items):
+        item_id = item_ids[k % len(item_ids)]
+        origin = len(series[item_id][1]) - k // len(item_ids)
+        if origin < context_length:
+            raise ValueError(f"Item {item_id} is too short for {n_items} contexts of {context_length} steps.")
+        pairs.append((item_id, origin))
+    return pairs
+
+
+def zero_shot_predictor(model_path, prediction_length, series, path):
+    """Creates a zero-shot Chronos predictor for a prediction length; fitting only registers the model."""
+    from autogluon.timeseries import TimeSeriesPredictor
+
+    from backtest import build_context
+
+    train_data = build_context(series, [(item_id, len(values)) for item_id, (_, values) in series.items()],
+                               max_context_length=4 * prediction_length + 1)
+    predictor = TimeSeriesPredictor(
+        path=path,
+        target="site",
+        prediction_length=prediction_length,
+        eval_metric="MAE",
+        freq="15min",
+        verbosity=0,
+    )
+    predictor.fit(
+        train_data,
+        hyperparameters={"Chronos": {"model_path": model_path}},
+        skip_model_selection=True,
+        enable_ensemble=False,
+    )
+    return predictor
+
+
+def run_case(predictor, series, batch_size, context_length, n_items, threads, repeats, warmup):
+    """Times the predict calls of one benchmark case.
+
+    Args:
+        predictor (TimeSeriesPredictor): Predictor under test.
+        series (Dict[Any, Tuple[pd.DatetimeIndex, np.ndarray]]): Series the contexts are cut from.
+        batch_size (int): Contexts per predict call.
+        context_length (int): Steps of history per context.
+        n_items (int): Number of contexts forecast per pass.
+        threads (int): Torch intra-op threads.
+        repeats (int): Timed passes over the `n_items` contexts.
+        warmup (int): Untimed predict calls before the timed passes.
+
+    Returns:
+        Dict[str, Any]: Case settings, latency percentiles in milliseconds and throughput in series/s.
+    """
+    import torch
+
+    from backtest import build_context
+
+    torch.set_num_threads(threads)
+    pairs = benchmark_pairs(series, n_items, context_length)
+    batches = [
+        build_context(series, pairs[start:start + batch_size], max_context_length=context_length)
+        for start in range(0, len(pairs), batch_size)
+    ]
+    for k in range(warmup):
+        predictor.predict(batches[k % len(batches)])
+
+    latencies = []
+    total_start = time.perf_counter()
+    for _ in range(repeats):
+        for batch in batches:
+            call_start = time.perf_counter()
+            predictor.predict(batch)
+            latencies.append(time.perf_counter() - call_start)
+    total = time.perf_counter() - total_start
+
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "batch_size": batch_size,
+        "context_length": context_length,
+        "n_items": n_items,
+        "prediction_length": predictor.prediction_length,
+        "threads": threads,
+        "calls": len(latencies),
+        "latency_ms": {
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "mean": float(latencies_ms.mean()),
+        },
+        "throughput_series_per_s": repeats * n_items / total,
+    }
+
+
+def environment():
+    """Returns the library versions and hardware the benchmark ran on."""
+    import autogluon.timeseries
+    import torch
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "autogluon": autogluon.timeseries.__version__,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chronos predict latency and throughput benchmark.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--context-lengths", type=int, nargs="+", default=[512, 2048])
+    parser.add_argument("--n-items", type=int, nargs="+", default=[64], help="Contexts forecast per pass")
+    parser.add_argument("--prediction-lengths", type=int, nargs="+", default=[96])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1], help="Torch threads")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes per case")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed predict calls per case")
+    parser.add_argument("--data", choices=["synthetic", "sites"], default="synthetic",
+                        help="Synthetic series or the bundled site CSVs")
+    parser.add_argument("--model-path", default="bolt_small", help="Chronos model of the zero-shot predictor")
+    parser.add_argument("--predictor-path", default=None,
+                        help="Benchmark a trained predictor instead; --prediction-lengths is then ignored")
+    parser.add_argument("--output", default="benchmark_predict.json")
+    args = parser.parse_args()
+
+    if args.data == "sites":
+        from backtest import get_series_arrays
+        from dataset import SITE_FILES, load_ts_data
+
+        series = get_series_arrays(load_ts_data(SITE_FILES))
+    else:
+        series = synthetic_series(16, max(args.context_lengths) + max(args.n_items))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.predictor_path:
+            from autogluon.timeseries import TimeSeriesPredictor
+
+            predictors = [TimeSeriesPredictor.load(args.predictor_path)]
+        else:
+            predictors = [
+                zero_shot_predictor(args.model_path, prediction_length, series, os.path.join(tmp_dir, str(prediction_length)))
+                for prediction_length in args.prediction_lengths
+            ]
+
+        for predictor in predictors:
+            for batch_size, context_length, n_items, threads in itertools.product(
+                args.batch_sizes, args.context_lengths, args.n_items, args.threads
+            ):
+                result = run_case(predictor, series, batch_size, context_length, n_items, threads, args.repeats,
+                                  args.warmup)
+                results.append(result)
+                print(
+                    f"pl={result['prediction_length']} batch={batch_size} context={context_length} items={n_items} "
+                    f"threads={threads}: p50={result['latency_ms']['p50']:.1f}ms "
+                    f"p99={result['latency_ms']['p99']:.1f}ms {result['throughput_series_per_s']:.1f} series/s"
+                )
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "environment": environment(),
+            "settings": {
+                "data": args.data,
+                "model_path": None if args.predictor_path else args.model_path,
+                "predictor_path": args.predictor_path,
+                "repeats": args.repeats,
+                "warmup": args.warmup,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
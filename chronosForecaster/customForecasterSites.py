@@ -0,0 +1,66 @@
+# This script runs our current forecaster from the forecast-model package on every site dataset in parallel.
+# The model config is downloaded from S3 once and reused from .cache/. Each site's forecasts are written to
+# output-custom/ and to the forecast store as soon as that site finishes.
+import argparse
+import json
+import os
+import time
+
+from dataset import SITE_FILES
+from forecast_store import ForecastStore
+from forecaster_runner import MODEL_CONFIG_URL, cache_model_config, run_sites, site_name
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the in-house Forecaster on many sites in a process pool.")
+    parser.add_argument("--files", nargs="+", default=SITE_FILES, help="Site dataset CSVs")
+    parser.add_argument("--output-dir", default="output-custom")
+    parser.add_argument("--config-url", default=MODEL_CONFIG_URL)
+    parser.add_argument("--timezone", default="America/Chicago")
+    parser.add_argument("--test-size-days", type=int, default=2)
+    parser.add_argument("--num-workers", type=int, default=None, help="Defaults to cpu_count // threads-per-worker")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--resume", action="store_true", help="Skip sites already in the forecast store")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    os.makedirs(args.output_dir, exist_ok=True)
+    config_path = cache_model_config(args.config_url)
+    print(f"Model config cached at {config_path}")
+
+    # Item ids follow the position in SITE_FILES, as in the Chronos runs; other files are numbered after the
+    # last site so their ids never collide with a site's
+    other_files = [file_path for file_path in dict.fromkeys(args.files) if file_path not in SITE_FILES]
+    item_ids = {file_path: SITE_FILES.index(file_path) for file_path in args.files if file_path in SITE_FILES}
+    item_ids.update({file_path: len(SITE_FILES) + k for k, file_path in enumerate(other_files)})
+    forecast_store = ForecastStore(os.path.join(args.output_dir, "forecast_store"), resume=args.resume)
+    done = set(forecast_store.item_ids())
+    file_paths = [file_path for file_path in args.files if item_ids[file_path] not in done]
+
+    def on_site(file_path, score, forecasts):
+        name = site_name(file_path)
+        output_path = os.path.join(args.output_dir, f"custom_forecaster_full_forecasts_1year-{name}.csv")
+        forecasts.to_csv(output_path + ".tmp", index=False)
+        os.replace(output_path + ".tmp", output_path)
+        forecast_store.append_frame(forecasts.assign(item_id=item_ids[file_path]))
+        forecast_store.flush()
+        print(f"{name}: score {score}, forecasts saved to {output_path}")
+
+    scores = run_sites(
+        config_path,
+        file_paths,
+        timezone=args.timezone,
+        test_size_days=args.test_size_days,
+        num_workers=args.num_workers,
+        threads_per_worker=args.threads_per_worker,
+        on_site=on_site,
+    )
+    scores_path = os.path.join(args.output_dir, "scores.json")
+    all_scores = {}
+    if args.resume and os.path.exists(scores_path):
+        with open(scores_path) as f:
+            all_scores = json.load(f)
+    all_scores.update({site_name(file_path): score for file_path, score in scores.items()})
+    with open(scores_path, "w") as f:
+        json.dump(all_scores, f, indent=2, default=str)
+
+    print(f"{len(scores)} of {len(file_paths)} sites done in {time.time() - start_time:.2f} seconds")
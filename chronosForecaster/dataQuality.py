@@ -0,0 +1,45 @@
+# This script scans the site datasets for gaps, stuck values, out-of-range values and step outliers, stores each
+# site's bitmask next to its Parquet cache and writes a per-site count of every flag. The masks are reused by
+# pipeline.py, baselineBacktest.py and peakWindowScores.py (`--mask-quality`) as long as the CSV and the thresholds
+# below are unchanged; new thresholds rescan the sites.
+#
+# Example:
+#   python dataQuality.py --stuck-run 12 --max-value 500000
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from data_quality import BAD, FLAGS, scan_sites
+from dataset import SITE_FILES
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Data-quality scan of the site datasets.")
+    parser.add_argument("--files", nargs="+", default=SITE_FILES, help="Site dataset CSVs")
+    parser.add_argument("--output", default="data/.cache/quality_summary.csv", help="Per-site flag counts")
+    parser.add_argument("--freq", default="15min", help="Frequency of the site grid")
+    parser.add_argument("--stuck-run", type=int, default=8, help="Identical consecutive values flagged as stuck")
+    parser.add_argument("--min-value", type=float, default=0.0, help="Values below this are out of range")
+    parser.add_argument("--max-value", type=float, default=None, help="Values above this are out of range")
+    parser.add_argument("--outlier-threshold", type=float, default=10.0,
+                        help="Steps beyond this many robust standard deviations are outliers")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    results = scan_sites(args.files, freq=args.freq, stuck_run=args.stuck_run, min_value=args.min_value,
+                         max_value=args.max_value, outlier_threshold=args.outlier_threshold)
+
+    rows = []
+    for item_id, file_path in enumerate(args.files):
+        _, mask = results[file_path]
+        row = {"item_id": item_id, "file": file_path, "intervals": len(mask)}
+        row.update({name: int(((mask & bit) != 0).sum()) for name, bit in FLAGS.items()})
+        row["bad"] = int(((mask & BAD) != 0).sum())
+        rows.append(row)
+    summary = pd.DataFrame(rows)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    summary.to_csv(args.output, index=False)
+    print(summary.to_string(index=False))
+    print(f"Scanned {len(args.files)} sites in {time.time() - start_time:.2f} seconds, summary saved to {args.output}")
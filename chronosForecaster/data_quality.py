@@ -0,0 +1,269 @@
+"""Vectorized data-quality scan of site series, stored as bitmask arrays next to the Parquet cache."""
+import inspect
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset import SITE_FILES, get_cache_path, load_site
+
+# Bits of the quality mask, one uint8 per interval of the site's regular time grid
+GAP = 1  # no observation, or a NaN value
+STUCK = 2  # part of a run of at least `stuck_run` identical values
+OUT_OF_RANGE = 4  # below `min_value` or above `max_value`
+STEP_OUTLIER = 8  # change from the previous interval far outside the site's usual step size
+BAD = GAP | STUCK | OUT_OF_RANGE | STEP_OUTLIER
+# Command-line names of the bits
+FLAGS = {"gap": GAP, "stuck": STUCK, "out_of_range": OUT_OF_RANGE, "step_outlier": STEP_OUTLIER}
+
+
+def get_quality_path(file_path, column="site"):
+    """Returns the quality mask path of a site CSV, e.g. data/.cache/demoData-1year.site.quality.npz."""
+    return os.path.splitext(get_cache_path(file_path))[0] + f".{column}.quality.npz"
+
+
+def get_fill_path(file_path, column="site"):
+    """Returns the path of the bits a fetch recorded before gap-filling a site CSV, see `save_fill_mask`."""
+    return os.path.splitext(get_cache_path(file_path))[0] + f".{column}.filled.npz"
+
+
+def flag_bits(names):
+    """Combines bit names such as ["gap", "stuck"] into one mask; "bad" stands for every bit."""
+    bits = 0
+    for name in names or []:
+        bits |= BAD if name == "bad" else FLAGS[name]
+    return bits
+
+
+def scan(values, stuck_run=8, min_value=0.0, max_value=None, outlier_threshold=10.0):
+    """Flags bad intervals of many series on a shared regular grid in one vectorized pass.
+
+    Args:
+        values (np.ndarray): Series values, shape (n_series, n_steps). Missing intervals are NaN.
+        stuck_run (int): Minimum number of identical consecutive values flagged as stuck, e.g. 8 = 2 hours.
+        min_value (Optional[float]): Values below this are out of range. No lower bound if None.
+        max_value (Optional[float]): Values above this are out of range. No upper bound if None.
+        outlier_threshold (float): Steps larger than this many robust standard deviations (1.4826 * MAD of the
+            series' steps) are outliers.
+
+    Returns:
+        np.ndarray: uint8 masks of GAP | STUCK | OUT_OF_RANGE | STEP_OUTLIER bits, shape (n_series, n_steps).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_series, n_steps = values.shape
+    missing = np.isnan(values)
+    mask = missing.astype(np.uint8) * GAP
+
+    with np.errstate(invalid="ignore"):
+        if min_value is not None:
+            mask |= (values < min_value).astype(np.uint8) * OUT_OF_RANGE
+        if max_value is not None:
+            mask |= (values > max_value).astype(np.uint8) * OUT_OF_RANGE
+
+    # Runs of identical values: a new run starts at every change, every NaN and every series start
+    new_run = np.ones_like(missing)
+    new_run[:, 1:] = (values[:, 1:] != values[:, :-1]) | missing[:, 1:] | missing[:, :-1]
+    run_ids = np.cumsum(new_run.ravel()) - 1
+    run_lengths = np.bincount(run_ids)
+    stuck = (run_lengths[run_ids] >= stuck_run).reshape(n_series, n_steps) & ~missing
+    mask |= stuck.astype(np.uint8) * STUCK
+
+    # Steps compared with a robust per-series scale, ignoring steps across gaps and within flat runs
+    steps = np.diff(values, axis=1)
+    steps[steps == 0] = np.nan
+    if np.isfinite(steps).any():
+        with np.errstate(invalid="ignore"):
+            center = np.nanmedian(steps, axis=1, keepdims=True)
+            scale = 1.4826 * np.nanmedian(np.abs(steps - center), axis=1, keepdims=True)
+            outliers = np.abs(steps - center) > outlier_threshold * scale
+        mask[:, 1:] |= outliers.astype(np.uint8) * STEP_OUTLIER
+    return mask
+
+
+# Thresholds of `scan` and their defaults, part of the settings a stored mask is checked against
+SCAN_DEFAULTS = {
+    name: parameter.default for name, parameter in inspect.signature(scan).parameters.items()
+    if parameter.default is not inspect.Parameter.empty
+}
+
+
+def scan_settings(column="site", freq="15min", **scan_kwargs):
+    """Returns the full settings of a scan as canonical JSON, so masks of other thresholds are never reused.
+
+    Raises:
+        TypeError: If a threshold is not a parameter of `scan`.
+    """
+    unknown = set(scan_kwargs) - set(SCAN_DEFAULTS)
+    if unknown:
+        raise TypeError(f"Unknown scan thresholds: {sorted(unknown)}")
+    settings = {"column": column, "freq": pd.Timedelta(freq).value, **SCAN_DEFAULTS, **scan_kwargs}
+    return json.dumps(settings, sort_keys=True)
+
+
+def scan_sites(file_paths=SITE_FILES, column="site", freq="15min", **scan_kwargs):
+    """Scans several site datasets at once and stores each mask next to its Parquet cache.
+
+    All sites are placed on one (site, time) grid so the scan is a single set of array operations. Bits
+    recorded by `save_fill_mask` when a CSV was gap-filled are added to the scan's bits, since the filled
+    values themselves look clean.
+
+    Args:
+        file_paths (Sequence[str]): Paths of the site CSVs.
+        column (str): Column to scan.
+        freq (str): Frequency of the site grid.
+        **scan_kwargs: Thresholds passed to `scan`.
+
+    Returns:
+        Dict[str, Tuple[pd.DatetimeIndex, np.ndarray]]: UTC grid and mask of every site, by file path.
+    """
+    freq_ns = pd.Timedelta(freq).value
+    series = []
+    for file_path in file_paths:
+        df = load_site(file_path, columns=(column,))
+        epochs = pd.DatetimeIndex(df["timestamp"]).as_unit("ns").asi8
+        series.append((epochs, df[column].to_numpy(dtype=np.float64)))
+
+    first = min(epochs.min() for epochs, _ in series)
+    last = max(epochs.max() for epochs, _ in series)
+    grid = np.full((len(series), (last - first) // freq_ns + 1), np.nan)
+    spans = []
+    for k, (epochs, values) in enumerate(series):
+        positions = (epochs - first) // freq_ns
+        # Off-grid timestamps are dropped, duplicates keep the last value
+        on_grid = (epochs - first) % freq_ns == 0
+        grid[k, positions[on_grid]] = values[on_grid]
+        spans.append((positions.min(), positions.max() + 1))
+
+    masks = scan(grid, **scan_kwargs)
+    settings = scan_settings(column, freq, **scan_kwargs)
+    results = {}
+    for file_path, (start, end), mask in zip(file_paths, spans, masks):
+        start_ns = first + start * freq_ns
+        fill_path = get_fill_path(file_path, column)
+        if os.path.exists(fill_path):
+            with np.load(fill_path) as data:
+                filled = data["mask"]
+                positions = (int(data["start_ns"]) - first) // freq_ns + np.arange(len(filled))
+            inside = (positions >= 0) & (positions < mask.shape[0])
+            mask[positions[inside]] |= filled[inside]
+        save_mask(get_quality_path(file_path, column), start_ns, freq_ns, mask[start:end], settings)
+        results[file_path] = (pd.DatetimeIndex(pd.to_datetime(start_ns + np.arange(end - start) * freq_ns,
+                                                               unit="ns", utc=True)), mask[start:end])
+    return results
+
+
+def save_mask(path, start_ns, freq_ns, mask, settings=""):
+    """Writes a mask atomically as a compressed .npz with its grid start, frequency and scan settings."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        np.savez_compressed(f, mask=mask, start_ns=start_ns, freq_ns=freq_ns, settings=settings)
+    os.replace(path + ".tmp", path)
+
+
+def save_fill_mask(file_path, timestamps, mask, column="site"):
+    """Records the bits of a site's raw readings before they are gap-filled into `file_path`.
+
+    Args:
+        file_path (str): Path the gap-filled CSV is written to.
+        timestamps (pd.DatetimeIndex): Regular UTC grid of the raw readings.
+        mask (np.ndarray): uint8 bits of every grid interval, e.g. from `scan`.
+        column (str): Scanned column.
+    """
+    timestamps = pd.DatetimeIndex(timestamps)
+    if timestamps.tz is None:
+        timestamps = timestamps.tz_localize("UTC")
+    epochs = timestamps.as_unit("ns").asi8
+    save_mask(get_fill_path(file_path, column), epochs[0], int(epochs[1] - epochs[0]), np.asarray(mask, dtype=np.uint8))
+
+
+def load_mask(file_path, column="site", **scan_kwargs):
+    """Loads a site's quality mask, rescanning the site when the mask is missing, older than the CSV or its
+    recorded fill bits, or was scanned with other settings.
+
+    Args:
+        file_path (str): Path of the site CSV.
+        column (str): Scanned column.
+        **scan_kwargs: Grid frequency and thresholds passed to `scan_sites`.
+
+    Returns:
+        Tuple[int, int, np.ndarray]: Grid start (ns epoch), grid frequency (ns) and uint8 mask.
+    """
+    path = get_quality_path(file_path, column)
+    settings = scan_settings(column, **scan_kwargs)
+    fill_path = get_fill_path(file_path, column)
+    inputs = [file_path, fill_path] if os.path.exists(fill_path) else [file_path]
+    if os.path.exists(path) and all(os.path.getmtime(path) >= os.path.getmtime(source) for source in inputs):
+        with np.load(path) as data:
+            if "settings" in data.files and str(data["settings"]) == settings:
+                return int(data["start_ns"]), int(data["freq_ns"]), data["mask"]
+    scan_sites([file_path], column=column, **scan_kwargs)
+    with np.load(path) as data:
+        return int(data["start_ns"]), int(data["freq_ns"]), data["mask"]
+
+
+def quality_flags(file_path, timestamps, column="site", **scan_kwargs):
+    """Returns the quality bits of a site at the given timestamps, e.g. to weight or skip training rows.
+
+    Args:
+        file_path (str): Path of the site CSV.
+        timestamps (Sequence): Timestamps to look up, timezone-naive ones are taken as UTC.
+        column (str): Scanned column.
+        **scan_kwargs: Grid frequency and thresholds of the scan.
+
+    Returns:
+        np.ndarray: uint8 bits per timestamp; GAP for timestamps outside the site's grid.
+    """
+    start_ns, freq_ns, mask = load_mask(file_path, column, **scan_kwargs)
+    epochs = pd.DatetimeIndex(pd.to_datetime(timestamps, utc=True)).as_unit("ns").asi8
+    offsets = epochs - start_ns
+    positions = offsets // freq_ns
+    inside = (offsets >= 0) & (positions < len(mask)) & (offsets % freq_ns == 0)
+    flags = np.full(len(epochs), GAP, dtype=np.uint8)
+    flags[inside] = mask[positions[inside]]
+    return flags
+
+
+def mask_bad(df, file_path, bits=BAD, column="site", **scan_kwargs):
+    """Sets the values of flagged intervals to NaN, which Chronos and the metrics treat as missing.
+
+    Args:
+        df (pd.DataFrame): Output of `load_site`, with a `timestamp` column.
+        file_path (str): Path of the site CSV `df` was loaded from.
+        bits (int): Quality bits to mask, e.g. STUCK | STEP_OUTLIER.
+        column (str): Column to mask.
+        **scan_kwargs: Grid frequency and thresholds of the scan.
+
+    Returns:
+        pd.DataFrame: Copy of `df` with flagged values of `column` set to NaN.
+    """
+    df = df.copy()
+    flagged = (quality_flags(file_path, df["timestamp"], column, **scan_kwargs) & bits) != 0
+    df.loc[flagged, column] = np.nan
+    return df
+
+
+def mask_sites(df, file_paths=SITE_FILES, bits=BAD, column="site", value_column=None, **scan_kwargs):
+    """Sets flagged values of a long multi-site frame to NaN, so training skips them and metrics do not score them.
+
+    Args:
+        df (pd.DataFrame): Output of `load_sites` or `read_training_frame`, with `item_id` and `timestamp`.
+        file_paths (Sequence[str]): Paths of the site CSVs, the position is the item_id.
+        bits (int): Quality bits to mask.
+        column (str): Scanned column.
+        value_column (Optional[str]): Column to mask if it was renamed, e.g. "actual". `column` if None.
+        **scan_kwargs: Grid frequency and thresholds of the scan.
+
+    Returns:
+        pd.DataFrame: Copy of `df` with flagged values set to NaN.
+    """
+    df = df.copy()
+    item_ids = df["item_id"].to_numpy()
+    flagged = np.zeros(len(df), dtype=bool)
+    for item_id, file_path in enumerate(file_paths):
+        rows = np.flatnonzero(item_ids == item_id)
+        if len(rows):
+            flags = quality_flags(file_path, df["timestamp"].iloc[rows], column, **scan_kwargs)
+            flagged[rows] = (flags & bits) != 0
+    df.loc[flagged, value_column or column] = np.nan
+    return df
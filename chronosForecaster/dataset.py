@@ -0,0 +1,110 @@
+"""Shared loader for the site CSVs in data/, cached as Parquet."""
+import os
+
+import pandas as pd
+
+from timestamps import NAT, epochs_to_datetime, parse_timestamps
+
+# Site datasets, the position in the list is the Chronos item_id
+SITE_FILES = [
+    "data/demoData-1year.csv",
+    "data/kyLibData-1year.csv",
+    "data/petcoData-1year.csv",
+    "data/policeData-1year.csv",
+    "data/tryStarData-1year.csv",
+]
+
+CACHE_DIR_NAME = ".cache"
+
+
+def get_cache_path(file_path):
+    """Returns the Parquet cache path of a site CSV, e.g. data/.cache/demoData-1year.parquet."""
+    folder, name = os.path.split(file_path)
+    return os.path.join(folder, CACHE_DIR_NAME, os.path.splitext(name)[0] + ".parquet")
+
+
+def parse_site_csv(file_path):
+    """Parses a site CSV once, with the shared vectorized timestamp parser converting `date_time` to UTC.
+
+    Args:
+        file_path (str): Path of the site CSV.
+
+    Returns:
+        pd.DataFrame: All columns of the CSV, `date_time` renamed to a UTC `timestamp` column.
+    """
+    df = pd.read_csv(file_path)
+    df.rename(columns={"date_time": "timestamp"}, inplace=True)
+    # Timestamps without an offset are UTC
+    epochs = parse_timestamps(df["timestamp"])
+    df = df[epochs != NAT].reset_index(drop=True)
+    df["timestamp"] = epochs_to_datetime(epochs[epochs != NAT])
+    return df
+
+
+def ensure_cache(file_path):
+    """Parses a site CSV into its Parquet cache if the cache is missing or older than the CSV.
+
+    Args:
+        file_path (str): Path of the site CSV.
+
+    Returns:
+        str: Path of the Parquet cache.
+    """
+    cache_path = get_cache_path(file_path)
+    if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(file_path):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        parse_site_csv(file_path).to_parquet(cache_path + ".tmp", index=False)
+        os.replace(cache_path + ".tmp", cache_path)
+    return cache_path
+
+
+def load_site(file_path, columns=("site",), naive=False):
+    """Loads columns of a site dataset, parsing the CSV only when its Parquet cache is missing or stale.
+
+    Args:
+        file_path (str): Path of the site CSV.
+        columns (Sequence[str]): Columns to read besides `timestamp`.
+        naive (bool): Return timezone-naive UTC timestamps, as Chronos requires.
+
+    Returns:
+        pd.DataFrame: `timestamp` and the requested columns.
+    """
+    df = pd.read_parquet(ensure_cache(file_path), columns=["timestamp", *columns])
+    if naive:
+        df["timestamp"] = df["timestamp"].dt.tz_convert(None)
+    return df
+
+
+def load_sites(file_paths=SITE_FILES, columns=("site",), naive=False):
+    """Loads several site datasets into one long frame with an `item_id` column.
+
+    Args:
+        file_paths (Sequence[str]): Paths of the site CSVs, the position becomes the item_id.
+        columns (Sequence[str]): Columns to read besides `timestamp`.
+        naive (bool): Return timezone-naive UTC timestamps, as Chronos requires.
+
+    Returns:
+        pd.DataFrame: `item_id`, `timestamp` and the requested columns.
+    """
+    dataframes = []
+    for idx, file_path in enumerate(file_paths):
+        df = load_site(file_path, columns=columns, naive=naive)
+        df.insert(0, "item_id", idx)
+        dataframes.append(df)
+    return pd.concat(dataframes, ignore_index=True)
+
+
+def load_ts_data(file_paths=SITE_FILES, target="site"):
+    """Loads the site datasets as a TimeSeriesDataFrame with timezone-naive UTC timestamps.
+
+    Args:
+        file_paths (Sequence[str]): Paths of the site CSVs, the position becomes the item_id.
+        target (str): Column to load as the target.
+
+    Returns:
+        TimeSeriesDataFrame: Target series of every site.
+    """
+    from autogluon.timeseries import TimeSeriesDataFrame
+
+    full_df = load_sites(file_paths, columns=(target,), naive=True)
+    return TimeSeriesDataFrame(full_df.set_index(["item_id", "timestamp"]))
@@ -0,0 +1,48 @@
+# This script starts a resident forecast service around a trained Chronos predictor.
+# The predictor is loaded once; clients append observations per site and request 96-step forecasts over HTTP
+# (or a Unix socket). Requests arriving within --window-ms are answered by one batched predict call.
+#
+# Example:
+#   python forecastService.py --predictor-path model-cache/<key> --seed-sites
+#   curl -X POST localhost:8080/sites/0/forecast
+#   curl localhost:8080/metrics
+import argparse
+
+from autogluon.timeseries import TimeSeriesPredictor
+
+from dataset import SITE_FILES, load_sites
+from forecast_service import SiteContexts, serve
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident Chronos forecast service with request micro-batching.")
+    parser.add_argument("--predictor-path", required=True, help="Folder of the trained TimeSeriesPredictor")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", default=None, help="Serve on this socket path instead of host/port")
+    parser.add_argument("--window-ms", type=float, default=10, help="Micro-batching window")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Requests per predict call")
+    parser.add_argument("--max-context-length", type=int, default=2048, help="Steps of history kept per site")
+    parser.add_argument("--seed-sites", action="store_true",
+                        help="Start with the history of the bundled sites, site ids are their item ids")
+    args = parser.parse_args()
+
+    predictor = TimeSeriesPredictor.load(args.predictor_path)
+    contexts = SiteContexts(max_context_length=args.max_context_length, freq="15min")
+    if args.seed_sites:
+        full_df = load_sites(SITE_FILES, columns=(predictor.target,))
+        for item_id, site_df in full_df.groupby("item_id"):
+            site_df = site_df.tail(args.max_context_length)
+            contexts.append(str(item_id), site_df["timestamp"], site_df[predictor.target])
+        print(f"Seeded {len(contexts.site_ids())} sites.")
+
+    serve(
+        predictor,
+        contexts,
+        prediction_length=predictor.prediction_length,
+        host=args.host,
+        port=args.port,
+        unix_socket=args.unix_socket,
+        window_ms=args.window_ms,
+        max_batch_size=args.max_batch_size,
+        target=predictor.target,
+    )
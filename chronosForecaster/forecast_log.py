@@ -0,0 +1,101 @@
+"""Append-only, resumable Parquet log of walk-forward forecasts."""
+import glob
+import os
+
+import pandas as pd
+
+
+class ForecastLog:
+    """Streams walk-forward forecast frames to disk as numbered Parquet part files.
+
+    Rows are buffered in memory and flushed every `flush_every` rows, so memory stays bounded however
+    many origins are forecast. Part files are written to a temporary name and renamed into place, so a
+    crash never leaves a half-written part behind and every part on disk holds completed forecasts.
+    """
+
+    def __init__(self, directory, resume=False, flush_every=1024):
+        """Opens a forecast log.
+
+        Args:
+            directory (str): Folder holding the part files.
+            resume (bool): Keep the parts already in `directory`. If False, existing parts are deleted.
+            flush_every (int): Number of buffered rows that triggers a flush.
+        """
+        self.directory = directory
+        self.flush_every = flush_every
+        self._buffer = []
+        self._buffered_rows = 0
+        os.makedirs(directory, exist_ok=True)
+        if not resume:
+            for part in self._parts():
+                os.remove(part)
+        parts = self._parts()
+        self._next_part = int(os.path.basename(parts[-1])[len("part-"):-len(".parquet")]) + 1 if parts else 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Flush on Ctrl-C or errors too, so that completed forecasts are kept for a resumed run
+        self.flush()
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.directory, "part-*.parquet")))
+
+    def append(self, frame):
+        """Adds wide walk-forward rows (item_id, start_time, target_1..target_N) to the log.
+
+        Args:
+            frame (pd.DataFrame): Forecast rows to append.
+        """
+        if frame.empty:
+            return
+        self._buffer.append(frame)
+        self._buffered_rows += len(frame)
+        if self._buffered_rows >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows to a new part file."""
+        if not self._buffer:
+            return
+        part = os.path.join(self.directory, f"part-{self._next_part:05d}.parquet")
+        pd.concat(self._buffer, ignore_index=True).to_parquet(part + ".tmp", index=False)
+        os.replace(part + ".tmp", part)
+        self._next_part += 1
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def completed(self):
+        """Returns the (item_id, start_time) pairs already in the log.
+
+        Returns:
+            Set[Tuple[Any, pd.Timestamp]]: Completed pairs, start times in UTC.
+        """
+        done = set()
+        for part in self._parts():
+            keys = pd.read_parquet(part, columns=["item_id", "start_time"])
+            done.update(zip(keys["item_id"], keys["start_time"]))
+        return done
+
+    def iter_parts(self):
+        """Yields the log one part file at a time, so a long log can be scored without loading it whole.
+
+        Yields:
+            pd.DataFrame: Walk-forward forecasts of one part, columns item_id, start_time, target_1..target_N.
+        """
+        self.flush()
+        for part in self._parts():
+            yield pd.read_parquet(part)
+
+    def read(self):
+        """Reads the whole log, sorted by item and origin.
+
+        Returns:
+            pd.DataFrame: Walk-forward forecasts with columns item_id, start_time, target_1..target_N.
+        """
+        frames = list(self.iter_parts())
+        if not frames:
+            return pd.DataFrame(columns=["item_id", "start_time"])
+        df = pd.concat(frames, ignore_index=True)
+        return df.sort_values(["item_id", "start_time"], kind="stable").reset_index(drop=True)
@@ -0,0 +1,327 @@
+"""Resident forecast service: keeps a trained predictor loaded and micro-batches concurrent forecast requests."""
+import collections
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from backtest import build_context
+
+
+class SiteContexts:
+    """Latest `max_context_length` values of every site on a regular time grid, safe to use from many threads."""
+
+    def __init__(self, max_context_length=2048, freq="15min"):
+        """Inits empty site contexts.
+
+        Args:
+            max_context_length (int): Number of most recent steps kept per site.
+            freq (str): Frequency of the grid.
+        """
+        self.max_context_length = max_context_length
+        self.freq_ns = pd.Timedelta(freq).value
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def append(self, site_id, timestamps, values):
+        """Appends observations to a site's context.
+
+        Observations at or before the site's last timestamp are ignored, and missing grid steps are filled
+        with NaN so the context stays regular.
+
+        Args:
+            site_id (str): Site the observations belong to.
+            timestamps (Sequence): Timestamps of the observations, timezone-naive ones are taken as UTC.
+            values (Sequence[float]): Observed values.
+
+        Returns:
+            int: Number of steps in the site's context after the append.
+        """
+        index = pd.DatetimeIndex(pd.to_datetime(timestamps, utc=True))
+        epochs = index.as_unit("ns").asi8
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(epochs, kind="stable")
+        epochs, values = epochs[order], values[order]
+
+        with self._lock:
+            first_epoch, old_values = self._sites.get(site_id, (None, np.empty(0)))
+            if first_epoch is None:
+                first_epoch = epochs[0] if len(epochs) else None
+            if first_epoch is None:
+                return 0
+            last_epoch = first_epoch + (len(old_values) - 1) * self.freq_ns
+            keep = epochs > last_epoch if len(old_values) else np.ones(len(epochs), dtype=bool)
+            epochs, values = epochs[keep], values[keep]
+            if len(epochs) == 0:
+                return len(old_values)
+
+            positions = (epochs - first_epoch) // self.freq_ns
+            grid = np.full(max(len(old_values), positions[-1] + 1), np.nan)
+            grid[:len(old_values)] = old_values
+            grid[positions] = values
+
+            # Drop the oldest steps beyond the context length
+            drop = max(0, len(grid) - self.max_context_length)
+            self._sites[site_id] = (first_epoch + drop * self.freq_ns, grid[drop:])
+            return len(grid) - drop
+
+    def snapshot(self, site_ids):
+        """Returns the contexts of some sites as `get_series_arrays` output, with timezone-naive UTC timestamps.
+
+        Raises:
+            KeyError: If a site has no context.
+        """
+        with self._lock:
+            contexts = {site_id: self._sites[site_id] for site_id in site_ids}
+        series = {}
+        for site_id, (first_epoch, values) in contexts.items():
+            epochs = first_epoch + np.arange(len(values), dtype=np.int64) * self.freq_ns
+            series[site_id] = (pd.DatetimeIndex(epochs.astype("datetime64[ns]")), values)
+        return series
+
+    def site_ids(self):
+        """Returns the ids of the sites with a context."""
+        with self._lock:
+            return list(self._sites)
+
+
+class ServiceMetrics:
+    """Request latency percentiles over the last `window` requests, queue depth and batch sizes."""
+
+    def __init__(self, window=10000):
+        self.latencies = collections.deque(maxlen=window)
+        self.batch_sizes = collections.deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+    def record_batch(self, latencies, failed=False):
+        """Records the end-to-end latencies in seconds of the requests answered by one predict call."""
+        with self._lock:
+            self.latencies.extend(latencies)
+            self.batch_sizes.append(len(latencies))
+            self.requests += len(latencies)
+            if failed:
+                self.errors += len(latencies)
+
+    def record_queue_depth(self, depth):
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def to_dict(self, queue_depth):
+        """Returns the metrics as a JSON-serializable dict."""
+        with self._lock:
+            latencies_ms = np.array(self.latencies) * 1000
+            batch_sizes = np.array(self.batch_sizes)
+            p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if len(latencies_ms) else (None, None, None)
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "queue_depth": queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "batches": len(batch_sizes),
+                "mean_batch_size": float(batch_sizes.mean()) if len(batch_sizes) else None,
+                "latency_ms": {
+                    "p50": None if p50 is None else float(p50),
+                    "p95": None if p95 is None else float(p95),
+                    "p99": None if p99 is None else float(p99),
+                },
+            }
+
+
+class MicroBatcher:
+    """Coalesces forecast requests arriving within `window_ms` of each other into one predict call."""
+
+    def __init__(self, predictor, contexts, prediction_length=96, window_ms=10, max_batch_size=64, target="site"):
+        """Inits the batcher and starts its worker thread.
+
+        Args:
+            predictor (TimeSeriesPredictor): Trained predictor, kept loaded for the life of the service.
+            contexts (SiteContexts): Contexts the forecasts are made from.
+            prediction_length (int): Steps forecast per request, the predictor's prediction length.
+            window_ms (float): How long the first request of a batch waits for others to join it.
+            max_batch_size (int): Maximum number of requests per predict call.
+            target (str): Name of the target column the predictor was trained on.
+        """
+        self.predictor = predictor
+        self.contexts = contexts
+        self.prediction_length = prediction_length
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.target = target
+        self.metrics = ServiceMetrics()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, site_id):
+        """Queues a forecast from the current context of a site.
+
+        Returns:
+            Future: Resolves to a dict with the start time, mean and quantile forecasts of the site.
+        """
+        future = Future()
+        self._queue.put((site_id, time.perf_counter(), future))
+        self.metrics.record_queue_depth(self._queue.qsize())
+        return future
+
+    def _run(self):
+        while True:
+            requests = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(requests) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    requests.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._predict(requests)
+
+    def _predict(self, requests):
+        try:
+            site_ids = list(dict.fromkeys(site_id for site_id, _, _ in requests))
+            series = self.contexts.snapshot(site_ids)
+            pairs = [(site_id, len(series[site_id][1])) for site_id in site_ids]
+            pred = self.predictor.predict(build_context(series, pairs, target=self.target))
+
+            # Predictions come back grouped by synthetic item id, prediction_length rows each
+            synthetic_ids = np.asarray(pred.index.get_level_values("item_id")[::self.prediction_length])
+            quantile_columns = [column for column in pred.columns if column != "mean"]
+            mean = pred["mean"].to_numpy().reshape(-1, self.prediction_length)
+            quantiles = pred[quantile_columns].to_numpy().reshape(-1, self.prediction_length, len(quantile_columns))
+            results = {}
+            for row, synthetic_id in enumerate(synthetic_ids):
+                site_id = site_ids[synthetic_id]
+                timestamps = series[site_id][0]
+                results[site_id] = {
+                    "site_id": site_id,
+                    "start_time": (timestamps[-1] + pd.Timedelta(self.contexts.freq_ns)).tz_localize("UTC").isoformat(),
+                    "mean": mean[row].tolist(),
+                    "quantiles": {column: quantiles[row, :, k].tolist() for k, column in enumerate(quantile_columns)},
+                }
+        except Exception as e:
+            now = time.perf_counter()
+            self.metrics.record_batch([now - received for _, received, _ in requests], failed=True)
+            for _, _, future in requests:
+                future.set_exception(e)
+            return
+
+        now = time.perf_counter()
+        self.metrics.record_batch([now - received for _, received, _ in requests])
+        for site_id, _, future in requests:
+            future.set_result(results[site_id])
+
+
+def make_handler(contexts, batcher, timeout=30.0):
+    """Builds the HTTP request handler of the service.
+
+    Routes:
+        POST /sites/<site_id>/append   {"timestamps": [...], "values": [...]} -> {"context_length": n}
+        POST /sites/<site_id>/forecast optional {"timestamps": [...], "values": [...]} appended first
+        GET  /sites                    ids of the sites with a context
+        GET  /metrics                  latency percentiles, queue depth and batch sizes
+    """
+
+    class ForecastHandler(BaseHTTPRequestHandler):
+        def address_string(self):
+            # Unix socket clients have no host address
+            return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length)) if length else {}
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(200, batcher.metrics.to_dict(batcher.queue_depth()))
+            elif self.path == "/sites":
+                self._send(200, {"sites": contexts.site_ids()})
+            else:
+                self._send(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            parts = self.path.strip("/").split("/")
+            if len(parts) != 3 or parts[0] != "sites" or parts[2] not in ("append", "forecast"):
+                self._send(404, {"error": f"Unknown path {self.path}"})
+                return
+            site_id, action = parts[1], parts[2]
+            try:
+                body = self._read_json()
+                context_length = None
+                if body.get("timestamps"):
+                    context_length = contexts.append(site_id, body["timestamps"], body["values"])
+                if action == "append":
+                    self._send(200, {"site_id": site_id, "context_length": context_length})
+                    return
+                if site_id not in contexts.site_ids():
+                    self._send(404, {"error": f"Site {site_id} has no context, append observations first"})
+                    return
+                self._send(200, batcher.submit(site_id).result(timeout=timeout))
+            except (ValueError, KeyError) as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ForecastHandler
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a Unix socket, one thread per connection."""
+
+    daemon_threads = True
+
+
+def serve(predictor, contexts, prediction_length=96, host="127.0.0.1", port=8080, unix_socket=None, window_ms=10,
+          max_batch_size=64, target="site"):
+    """Serves forecasts until interrupted.
+
+    Args:
+        predictor (TimeSeriesPredictor): Trained predictor.
+        contexts (SiteContexts): Site contexts, possibly seeded with history.
+        prediction_length (int): Steps forecast per request, the predictor's prediction length.
+        host (str): Interface of the HTTP server.
+        port (int): Port of the HTTP server.
+        unix_socket (Optional[str]): Serve on this Unix socket path instead of host/port.
+        window_ms (float): Micro-batching window.
+        max_batch_size (int): Maximum number of requests per predict call.
+        target (str): Name of the target column the predictor was trained on.
+    """
+    batcher = MicroBatcher(predictor, contexts, prediction_length=prediction_length, window_ms=window_ms,
+                           max_batch_size=max_batch_size, target=target)
+    handler = make_handler(contexts, batcher)
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, handler)
+        print(f"Serving forecasts on unix socket {unix_socket}")
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        print(f"Serving forecasts on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
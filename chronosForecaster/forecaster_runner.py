@@ -0,0 +1,167 @@
+"""Runs the in-house `forecast_models` Forecaster on many site datasets in a process pool."""
+import contextlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from dataset import CACHE_DIR_NAME
+from timestamps import parse_timestamps
+
+MODEL_CONFIG_URL = "s3://i-kan-train/default_configs/ml-configs/site/model_config_v7.json"
+# Thread pool sizes read by OpenMP, MKL and OpenBLAS when numpy or torch is first imported
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def cache_model_config(url=MODEL_CONFIG_URL, cache_dir=CACHE_DIR_NAME):
+    """Downloads a model config once and returns the path of the local copy.
+
+    Args:
+        url (str): Location of the config JSON, any fsspec URL such as s3://.
+        cache_dir (str): Folder of the local copy.
+
+    Returns:
+        str: Path of the cached config, loadable with `ModelConfig.load_config_from_json`.
+    """
+    import fsspec
+
+    cache_path = os.path.join(cache_dir, os.path.basename(url))
+    if not os.path.exists(cache_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        with fsspec.open(url, "rb") as src, open(cache_path + ".tmp", "wb") as dst:
+            dst.write(src.read())
+        os.replace(cache_path + ".tmp", cache_path)
+    return cache_path
+
+
+def site_name(file_path):
+    """Returns the short site name of a dataset, e.g. "police" for data/policeData-1year.csv."""
+    stem = os.path.splitext(os.path.basename(file_path))[0].split("-")[0]
+    return stem[:-len("Data")] if stem.endswith("Data") else stem
+
+
+def truncate_site_csv(file_path, end):
+    """Returns a copy of a site CSV without the rows after `end`, or the CSV itself if it has none.
+
+    The Forecaster holds out the last `test_size_days` of the file it reads, so cutting the file at the end of a
+    test window makes it score that window. The copy is cached next to the Parquet caches and rebuilt when the CSV
+    changes.
+
+    Args:
+        file_path (str): Site dataset CSV.
+        end (datetime): Last timestamp to keep (UTC if timezone-naive).
+
+    Returns:
+        str: Path of the CSV to give the Forecaster.
+    """
+    end = pd.Timestamp(end)
+    end = end.tz_localize("UTC") if end.tzinfo is None else end.tz_convert("UTC")
+    folder, name = os.path.split(file_path)
+    cache_path = os.path.join(folder, CACHE_DIR_NAME, f"{os.path.splitext(name)[0]}-until-{end:%Y%m%dT%H%M}.csv")
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(file_path):
+        return cache_path
+
+    raw = pd.read_csv(file_path)
+    keep = parse_timestamps(raw["date_time"]) <= end.as_unit("ns").value
+    if keep.all():
+        return file_path
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    raw[keep].to_csv(cache_path + ".tmp", index=False)
+    os.replace(cache_path + ".tmp", cache_path)
+    return cache_path
+
+
+def run_site(config_path, file_path, timezone="America/Chicago", test_size_days=2):
+    """Trains and scores the Forecaster on one site dataset.
+
+    Args:
+        config_path (str): Local model config JSON, see `cache_model_config`.
+        file_path (str): Site dataset CSV.
+        timezone (str): Timezone of the site.
+        test_size_days (int): Days held out for scoring.
+
+    Returns:
+        Tuple[Any, pd.DataFrame]: The score and the forecasts in the wide format (start_time, target_1..target_N).
+    """
+    import numpy as np
+    from forecast_models.models.forecaster import Forecaster, ModelConfig
+
+    # Fix for older NumPy versions
+    np.float = float
+
+    model_config = ModelConfig.load_config_from_json(config_path)
+    model_config.dataset_config.dataset_location = file_path
+    model_config.dataset_config.timezone = timezone
+    model_config.dataset_config.test_size_days = test_size_days
+
+    forecaster = Forecaster(model_config=model_config, inference_only=False)
+    forecaster.train()
+    score, forecasts = forecaster.score(return_forecasts=True)
+
+    forecasts.index.name = "start_time"
+    forecasts = forecasts.reset_index()
+    forecasts["start_time"] = pd.to_datetime(forecasts["start_time"]).dt.tz_convert("UTC")
+    return score, forecasts
+
+
+@contextlib.contextmanager
+def worker_thread_limits(threads_per_worker):
+    """Sets the numeric library thread counts in this process's environment while workers are spawned.
+
+    A spawned worker imports numpy while it unpickles its first task, before any initializer runs, so the
+    limits must already be in the environment it inherits. The previous values are restored on exit.
+    """
+    previous = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    os.environ.update({name: str(threads_per_worker) for name in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run_sites(config_path, file_paths, timezone="America/Chicago", test_size_days=2, num_workers=None,
+              threads_per_worker=1, on_site=None):
+    """Trains and scores the Forecaster on every site dataset, one process per site.
+
+    Workers are spawned, so the calling script must be guarded by `if __name__ == "__main__":`.
+
+    Args:
+        config_path (str): Local model config JSON, see `cache_model_config`.
+        file_paths (Sequence[str]): Site dataset CSVs.
+        timezone (str): Timezone of the sites.
+        test_size_days (int): Days held out for scoring.
+        num_workers (Optional[int]): Number of worker processes. Defaults to cpu_count // threads_per_worker.
+        threads_per_worker (int): Numeric library threads of each worker.
+        on_site (Optional[Callable[[str, Any, pd.DataFrame], None]]): Called with the file path, score and
+            forecasts of each site as soon as it finishes, e.g. to write them out.
+
+    Returns:
+        Dict[str, Any]: Score of every site that finished, by file path.
+    """
+    num_workers = num_workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+    scores = {}
+    # Workers are started as tasks are submitted, so the limits stay set for the life of the pool
+    with worker_thread_limits(threads_per_worker), ProcessPoolExecutor(
+        max_workers=min(num_workers, max(1, len(file_paths))),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        futures = {
+            executor.submit(run_site, config_path, file_path, timezone, test_size_days): file_path
+            for file_path in file_paths
+        }
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                score, forecasts = future.result()
+            except Exception as e:
+                print(f"[ERROR] Forecaster failed for {file_path}: {e}")
+                continue
+            scores[file_path] = score
+            if on_site is not None:
+                on_site(file_path, score, forecasts)
+    return scores
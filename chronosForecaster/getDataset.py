@@ -6,6 +6,8 @@ from datetime import datetime
 from forecast_models.constants import FORECAST_FREQUENCY_STRING
 from forecast_models.data_sources.weather_api import WeatherEndpoint, WeatherProvider
 from mock import (MockTimeSeriesAPIClient, MockWeatherAPIClient)
+from data_quality import save_fill_mask, scan
+from dataset import SITE_FILES
 from forecast_models.data_sources.time_series_api import (APIEnvironment as TimeSeriesAPIEnvironment)
 from forecast_models.data_sources.time_series_api import TimeSeriesAPIClient
 from forecast_models.data_sources.weather_api import WeatherAPIClient
@@ -83,6 +85,8 @@ class DataSource:
         return pd.merge(meter, weather, left_index=True, right_index=True, how="inner")
 
 # ---------- PARAMETERS ----------
+# The kyLib entry of SITE_FILES, so the site loaders and data_quality.py find the CSV and its fill mask
+output_path = SITE_FILES[1]
 start_dt = datetime(2024, 1, 1, tzinfo=pytz.UTC)
 end_dt = datetime(2025, 4, 1, tzinfo=pytz.UTC)
 timespan = {TimespanConstants.start: start_dt, TimespanConstants.end: end_dt}
@@ -100,6 +104,9 @@ data_source = DataSource(
 
 df = data_source.get_meter_and_weather_data(timespan)
 df.index.name = "date_time"
-df = df.reindex(timestamp_index).interpolate(method="time").reset_index()
+df = df.reindex(timestamp_index)
+# Gaps are interpolated below, so the quality bits of the raw readings are recorded for data_quality.py first
+save_fill_mask(output_path, timestamp_index, scan(df[["site"]].to_numpy().T)[0])
+df = df.interpolate(method="time").reset_index()
 df.rename(columns={"index": "date_time"}, inplace=True)
-df.to_csv("kyLibData.csv", index=False)
\ No newline at end of file
+df.to_csv(output_path, index=False)
\ No newline at end of file
@@ -0,0 +1,117 @@
+# This script compares Chronos and our current forecaster on the same sites and forecast origins.
+# The site data is loaded once for Chronos and for scoring. Both forecasters run at the same time: Chronos in this
+# process, the forecast-model Forecaster in a process pool. The errors are computed in one pass over the origins
+# forecast by both and written as joined per-step and per-item tables.
+#
+# Example:
+#   python headToHead.py --predictor-path model-cache/<key>
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from dataset import SITE_FILES, load_sites
+from forecaster_runner import MODEL_CONFIG_URL, cache_model_config, run_sites, truncate_site_csv
+from metrics import ForecastTensor, align_tensors, errors_by_item, errors_by_step, gather_actuals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Head-to-head backtest of Chronos and the in-house Forecaster.")
+    parser.add_argument("--predictor-path", required=True, help="Folder of the trained TimeSeriesPredictor")
+    parser.add_argument("--files", nargs="+", default=SITE_FILES, help="Site dataset CSVs")
+    parser.add_argument("--output-dir", default="output-compare")
+    parser.add_argument("--test-start", default="2025-01-01", help="First forecast origin (YYYY-MM-DD)")
+    parser.add_argument("--test-end", default="2025-01-03",
+                        help="End of the test window (YYYY-MM-DD), where the in-house Forecaster's site data is cut")
+    parser.add_argument("--prediction-length", type=int, default=96)
+    parser.add_argument("--batch-size", type=int, default=64, help="Chronos contexts per predict call")
+    parser.add_argument("--max-context-length", type=int, default=2048)
+    parser.add_argument("--chronos-threads", type=int, default=None, help="Torch threads of the Chronos run")
+    parser.add_argument("--config-url", default=MODEL_CONFIG_URL)
+    parser.add_argument("--timezone", default="America/Chicago")
+    parser.add_argument("--num-workers", type=int, default=None, help="In-house Forecaster worker processes")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    os.makedirs(args.output_dir, exist_ok=True)
+    test_start_dt = datetime.fromisoformat(args.test_start)
+    test_end_dt = datetime.fromisoformat(args.test_end)
+    # The in-house Forecaster holds out the last test_size_days of each dataset, so the window must be whole days
+    window = test_end_dt - test_start_dt
+    if window <= pd.Timedelta(0) or window % pd.Timedelta(days=1):
+        raise ValueError(f"The test window {args.test_start} to {args.test_end} must span a positive number of days")
+    test_size_days = window.days
+
+    # Each site is loaded once, for the Chronos contexts and for the actuals, and checked before either run starts
+    full_df = load_sites(args.files, columns=("site",), naive=True)
+    data_ends = full_df.groupby("item_id")["timestamp"].max()
+    short = [args.files[item_id] for item_id, data_end in data_ends.items() if data_end < test_end_dt]
+    if short:
+        raise ValueError(f"Site data ends before --test-end {args.test_end}: {', '.join(short)}")
+    full_df = full_df[full_df["timestamp"] <= test_end_dt]
+    actual_df = full_df.rename(columns={"site": "actual"})
+    actual_df["timestamp"] = actual_df["timestamp"].dt.tz_localize("UTC")
+    item_ids = {file_path: idx for idx, file_path in enumerate(args.files)}
+    # The in-house Forecaster reads each CSV cut at the end of the window, so it scores the same days as Chronos
+    site_paths = {truncate_site_csv(file_path, test_end_dt): file_path for file_path in args.files}
+    config_path = cache_model_config(args.config_url)
+
+    def run_chronos():
+        import torch
+        from autogluon.timeseries import TimeSeriesDataFrame, TimeSeriesPredictor
+
+        from backtest import walk_forward
+
+        if args.chronos_threads:
+            torch.set_num_threads(args.chronos_threads)
+        ts_data = TimeSeriesDataFrame(full_df.set_index(["item_id", "timestamp"]))
+        predictor = TimeSeriesPredictor.load(args.predictor_path)
+        return walk_forward(predictor, ts_data, test_start_dt, test_end_dt, args.prediction_length,
+                            batch_size=args.batch_size, max_context_length=args.max_context_length)
+
+    def run_custom():
+        frames = []
+        scores = run_sites(
+            config_path,
+            list(site_paths),
+            timezone=args.timezone,
+            test_size_days=test_size_days,
+            num_workers=args.num_workers,
+            threads_per_worker=args.threads_per_worker,
+            on_site=lambda path, score, forecasts: frames.append(forecasts.assign(item_id=item_ids[site_paths[path]])),
+        )
+        failed = [file_path for path, file_path in site_paths.items() if path not in scores]
+        if not frames:
+            raise RuntimeError(f"The in-house Forecaster failed for every site: {', '.join(failed)}")
+        if failed:
+            print(f"In-house Forecaster failed for {', '.join(failed)}, scoring the other sites only.")
+        return pd.concat(frames, ignore_index=True)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        chronos_future = executor.submit(run_chronos)
+        custom_future = executor.submit(run_custom)
+        chronos_df, custom_df = chronos_future.result(), custom_future.result()
+    print(f"Forecasts done in {time.time() - start_time:.2f} seconds.")
+
+    # Score only the (item, origin) pairs both forecasters produced
+    chronos_tensor, custom_tensor = align_tensors(ForecastTensor.from_frame(chronos_df),
+                                                  ForecastTensor.from_frame(custom_df))
+    shared = len(chronos_tensor.to_frame())
+    print(f"{shared} shared origins ({len(chronos_df)} Chronos, {len(custom_df)} in-house).")
+    if shared == 0:
+        raise RuntimeError("Chronos and the in-house Forecaster share no (item, origin) pairs to score")
+    actuals = gather_actuals(chronos_tensor, actual_df)
+
+    step_errors = errors_by_step(chronos_tensor, actuals, "chronos").merge(
+        errors_by_step(custom_tensor, actuals, "custom"), on=["item_id", "step"]
+    )
+    item_errors = errors_by_item(chronos_tensor, actuals, "chronos").merge(
+        errors_by_item(custom_tensor, actuals, "custom"), on="item_id"
+    )
+    step_errors.to_csv(os.path.join(args.output_dir, "errors_by_step_compare.csv"), index=False)
+    item_errors.to_csv(os.path.join(args.output_dir, "errors_by_item_compare.csv"), index=False)
+    print(item_errors.to_string(index=False))
+    print(f"Total script runtime: {time.time() - start_time:.2f} seconds")
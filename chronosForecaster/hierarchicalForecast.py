@@ -0,0 +1,69 @@
+# This script forecasts sites, feeders and substations together and reconciles the forecasts so the levels add up.
+# The mapping CSV has one row per site with columns site (the item_id of the site data), feeder and substation.
+# Node histories are summed from the sites, all nodes are forecast in the same batched predict calls and the base
+# forecasts are reconciled with the sparse summing matrix of the hierarchy.
+#
+# Example:
+#   python hierarchicalForecast.py --predictor-path model-cache/<key> --mapping data/hierarchy.csv
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backtest import get_series_arrays
+from dataset import SITE_FILES, load_ts_data
+from hierarchy import Hierarchy, hierarchical_walk_forward, node_series
+from metrics import errors_by_item, gather_actuals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hierarchical site/feeder/substation forecasts with reconciliation.")
+    parser.add_argument("--predictor-path", required=True, help="Folder of the trained TimeSeriesPredictor")
+    parser.add_argument("--mapping", required=True, help="CSV with columns site, feeder and substation")
+    parser.add_argument("--output-dir", default="output-hier")
+    parser.add_argument("--test-start", default="2025-01-01", help="First forecast origin (YYYY-MM-DD)")
+    parser.add_argument("--test-end", default="2025-01-03", help="End of the test window (YYYY-MM-DD)")
+    parser.add_argument("--prediction-length", type=int, default=96)
+    parser.add_argument("--batch-size", type=int, default=None, help="Contexts per predict call, all at once if unset")
+    parser.add_argument("--max-context-length", type=int, default=2048)
+    parser.add_argument("--method", choices=["wls_struct", "ols", "bottom_up"], default="wls_struct")
+    args = parser.parse_args()
+
+    from autogluon.timeseries import TimeSeriesPredictor
+
+    start_time = time.time()
+    os.makedirs(args.output_dir, exist_ok=True)
+    hierarchy = Hierarchy.from_mapping(pd.read_csv(args.mapping))
+    series = get_series_arrays(load_ts_data(SITE_FILES))
+    predictor = TimeSeriesPredictor.load(args.predictor_path)
+
+    base, reconciled = hierarchical_walk_forward(
+        predictor,
+        series,
+        hierarchy,
+        datetime.fromisoformat(args.test_start),
+        datetime.fromisoformat(args.test_end),
+        args.prediction_length,
+        batch_size=args.batch_size,
+        max_context_length=args.max_context_length,
+        method=args.method,
+    )
+    base.to_frame().to_csv(os.path.join(args.output_dir, "base_forecasts.csv"), index=False)
+    reconciled.to_frame().to_csv(os.path.join(args.output_dir, "reconciled_forecasts.csv"), index=False)
+    print(f"{len(hierarchy.nodes)} nodes forecast and reconciled in {time.time() - start_time:.2f} seconds.")
+
+    # Actuals of every node, summed from the sites
+    nodes = node_series(hierarchy, series)
+    actual_df = pd.DataFrame({
+        "item_id": np.repeat(list(nodes), [len(grid) for grid, _ in nodes.values()]),
+        "timestamp": np.concatenate([grid.tz_localize("UTC") for grid, _ in nodes.values()]),
+        "actual": np.concatenate([values for _, values in nodes.values()]),
+    })
+    actuals = gather_actuals(base, actual_df)
+    node_errors = errors_by_item(base, actuals, "base").merge(errors_by_item(reconciled, actuals, "reconciled"),
+                                                              on="item_id")
+    node_errors.insert(1, "level", hierarchy.levels)
+    node_errors.to_csv(os.path.join(args.output_dir, "errors_by_node.csv"), index=False)
+    print(node_errors.to_string(index=False))
@@ -0,0 +1,199 @@
+"""Site -> feeder -> substation hierarchies: batched forecasts of every node and sparse reconciliation."""
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from backtest import concat_forecast_frames, get_forecast_pairs, predict_pairs
+from metrics import ForecastTensor
+
+
+class Hierarchy:
+    """A hierarchy of sites and the nodes above them, held as a sparse summing matrix S.
+
+    Nodes are ordered top level first and sites last, so S = [A; I] where each row of A marks the sites
+    under one aggregate node.
+    """
+
+    def __init__(self, nodes, levels, summing_matrix):
+        """Inits a hierarchy.
+
+        Args:
+            nodes (np.ndarray): Node names, e.g. "substation/S1", "feeder/F3", "site/0".
+            levels (np.ndarray): Level of every node, e.g. "substation", "feeder" or "site".
+            summing_matrix (sp.csr_matrix): S, shape (n_nodes, n_sites).
+        """
+        self.nodes = np.asarray(nodes)
+        self.levels = np.asarray(levels)
+        self.summing_matrix = summing_matrix.tocsr()
+
+    @property
+    def n_sites(self):
+        return self.summing_matrix.shape[1]
+
+    @property
+    def site_ids(self):
+        """Returns the site ids, in the column order of the summing matrix."""
+        return [node.split("/", 1)[1] for node in self.nodes[-self.n_sites:]]
+
+    @classmethod
+    def from_mapping(cls, mapping, site_column="site", levels=("feeder", "substation")):
+        """Builds a hierarchy from a mapping with one row per site.
+
+        Args:
+            mapping (pd.DataFrame): Site ids and the node of each level above them, e.g. columns site, feeder
+                and substation.
+            site_column (str): Column of the site ids, matching the item ids of the site data.
+            levels (Sequence[str]): Columns of the aggregate levels, from the lowest to the highest.
+
+        Returns:
+            Hierarchy: Nodes of every level and their summing matrix.
+        """
+        mapping = mapping.drop_duplicates(site_column).reset_index(drop=True)
+        n_sites = len(mapping)
+        nodes, node_levels, rows, cols = [], [], [], []
+        for level in reversed(levels):
+            codes, names = pd.factorize(mapping[level].astype(str), sort=True)
+            rows.append(len(nodes) + codes)
+            cols.append(np.arange(n_sites))
+            nodes.extend(f"{level}/{name}" for name in names)
+            node_levels.extend([level] * len(names))
+        rows.append(len(nodes) + np.arange(n_sites))
+        cols.append(np.arange(n_sites))
+        nodes.extend(f"site/{site_id}" for site_id in mapping[site_column].astype(str))
+        node_levels.extend(["site"] * n_sites)
+
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        summing_matrix = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(nodes), n_sites))
+        return cls(nodes, node_levels, summing_matrix)
+
+    def aggregate(self, site_values):
+        """Sums site values up the hierarchy.
+
+        Args:
+            site_values (np.ndarray): Values of every site along the first axis, e.g. shape (n_sites, n_steps).
+                NaN values count as 0; a node is NaN only if all of its sites are.
+
+        Returns:
+            np.ndarray: Values of every node, shape (n_nodes, ...).
+        """
+        site_values = np.asarray(site_values, dtype=np.float64)
+        flat = site_values.reshape(self.n_sites, -1)
+        observed = ~np.isnan(flat)
+        totals = self.summing_matrix @ np.where(observed, flat, 0.0)
+        counts = self.summing_matrix @ observed.astype(np.float64)
+        totals[counts == 0] = np.nan
+        return totals.reshape((len(self.nodes),) + site_values.shape[1:])
+
+    def reconcile(self, node_values, method="wls_struct"):
+        """Reconciles base forecasts of every node so that each level sums to the one above.
+
+        With weights W, the reconciled forecasts are S (S' W^-1 S)^-1 S' W^-1 y. Writing S = [A; I], the
+        Woodbury identity reduces the inverse to a dense solve of size n_aggregate_nodes, so all origins and
+        steps are reconciled with a few sparse products and one small solve.
+
+        Args:
+            node_values (np.ndarray): Base forecasts with the nodes along the first axis, e.g. shape
+                (n_nodes, n_origins, n_steps). Columns with any NaN are returned as NaN.
+            method (str): "ols" (W = I), "wls_struct" (W = number of sites under each node) or "bottom_up".
+
+        Returns:
+            np.ndarray: Reconciled forecasts, same shape as `node_values`.
+        """
+        node_values = np.asarray(node_values, dtype=np.float64)
+        flat = node_values.reshape(len(self.nodes), -1)
+        complete = ~np.isnan(flat).any(axis=0)
+        y = flat if complete.all() else flat[:, complete]
+        n_aggregates = len(self.nodes) - self.n_sites
+        aggregate_rows = self.summing_matrix[:n_aggregates]
+
+        if method == "bottom_up":
+            bottom = y[n_aggregates:]
+        else:
+            if method == "ols":
+                weights = np.ones(len(self.nodes))
+            elif method == "wls_struct":
+                weights = np.asarray(self.summing_matrix.sum(axis=1)).ravel()
+            else:
+                raise ValueError(f"Unknown reconciliation method {method}")
+            w_aggregate, w_site = weights[:n_aggregates], weights[n_aggregates:, None]
+
+            # (D + A' W_A^-1 A)^-1 b with D = W_sites^-1, via Woodbury
+            b = aggregate_rows.T @ (y[:n_aggregates] / w_aggregate[:, None]) + y[n_aggregates:] / w_site
+            z = w_site * b
+            inner = np.diag(w_aggregate) + (aggregate_rows @ sp.diags(w_site.ravel()) @ aggregate_rows.T).toarray()
+            bottom = z - w_site * (aggregate_rows.T @ np.linalg.solve(inner, aggregate_rows @ z))
+
+        reconciled = self.summing_matrix @ bottom
+        if not complete.all():
+            full = np.full_like(flat, np.nan)
+            full[:, complete] = reconciled
+            reconciled = full
+        return reconciled.reshape(node_values.shape)
+
+
+def node_series(hierarchy, series, freq="15min"):
+    """Builds the history of every node on one time grid from the site histories.
+
+    Args:
+        hierarchy (Hierarchy): Hierarchy whose sites are keys of `series` (compared as strings).
+        series (Dict[Any, Tuple[pd.DatetimeIndex, np.ndarray]]): Output of `get_series_arrays` for the sites.
+        freq (str): Frequency of the site series.
+
+    Returns:
+        Dict[str, Tuple[pd.DatetimeIndex, np.ndarray]]: Timestamps and values of every node, by node name.
+    """
+    by_name = {str(site_id): value for site_id, value in series.items()}
+    site_series = [by_name[site_id] for site_id in hierarchy.site_ids]
+    start = min(timestamps[0] for timestamps, _ in site_series)
+    end = max(timestamps[-1] for timestamps, _ in site_series)
+    grid = pd.date_range(start, end, freq=freq)
+
+    site_values = np.full((hierarchy.n_sites, len(grid)), np.nan)
+    for k, (timestamps, values) in enumerate(site_series):
+        positions = grid.get_indexer(timestamps)
+        site_values[k, positions[positions >= 0]] = values[positions >= 0]
+
+    node_values = hierarchy.aggregate(site_values)
+    return {node: (grid, np.ascontiguousarray(node_values[k])) for k, node in enumerate(hierarchy.nodes)}
+
+
+def hierarchical_walk_forward(predictor, series, hierarchy, test_start_dt, test_end_dt, prediction_length,
+                              batch_size=None, max_context_length=None, method="wls_struct", target="site"):
+    """Forecasts every node of a hierarchy over a walk-forward window and reconciles the forecasts.
+
+    Site, feeder and substation contexts are packed into the same predict calls; with `batch_size` None,
+    all (node, origin) pairs go into a single call.
+
+    Args:
+        predictor (TimeSeriesPredictor): Trained predictor.
+        series (Dict[Any, Tuple[pd.DatetimeIndex, np.ndarray]]): Output of `get_series_arrays` for the sites.
+        hierarchy (Hierarchy): Hierarchy of the sites.
+        test_start_dt (datetime): First forecast origin.
+        test_end_dt (datetime): End of the test window.
+        prediction_length (int): Number of steps forecast at each origin.
+        batch_size (Optional[int]): Number of contexts per predict call. All at once if None.
+        max_context_length (Optional[int]): Maximum number of past steps given to the model. Unbounded if None.
+        method (str): Reconciliation method, see `Hierarchy.reconcile`.
+        target (str): Name of the target column.
+
+    Returns:
+        Tuple[ForecastTensor, ForecastTensor]: Base and reconciled forecasts, item ids are the node names in
+            hierarchy order.
+    """
+    nodes = node_series(hierarchy, series)
+    pairs = get_forecast_pairs(nodes, test_start_dt, test_end_dt, prediction_length)
+    frames = [
+        batch.to_frame()
+        for batch in predict_pairs(predictor, nodes, pairs, prediction_length,
+                                   batch_size=batch_size or max(1, len(pairs)),
+                                   max_context_length=max_context_length, target=target)
+    ]
+    base = ForecastTensor.from_frame(concat_forecast_frames(frames, prediction_length))
+
+    # Node axis in hierarchy order, nodes without forecasts stay NaN
+    values = np.full((len(hierarchy.nodes), len(base.origins), prediction_length), np.nan)
+    rows = pd.Index(hierarchy.nodes).get_indexer(base.item_ids)
+    values[rows] = base.values
+    base = ForecastTensor(hierarchy.nodes, base.origins, values, freq=base.freq)
+    reconciled = ForecastTensor(hierarchy.nodes, base.origins, hierarchy.reconcile(values, method), freq=base.freq)
+    return base, reconciled
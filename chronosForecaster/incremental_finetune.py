@@ -0,0 +1,178 @@
+"""Warm-start incremental fine-tuning of Chronos as new site data arrives."""
+import glob
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from autogluon.timeseries import TimeSeriesDataFrame, TimeSeriesPredictor
+
+STATE_FILE = "finetune_state.json"
+
+
+def load_state(state_dir):
+    """Reads the state of the last fine-tuning round, or None before the first round.
+
+    Args:
+        state_dir (str): Folder holding the fine-tuning rounds and the state file.
+
+    Returns:
+        Optional[Dict]: Round number, checkpoint, predictor path and per-item cutoff timestamps.
+    """
+    state_path = os.path.join(state_dir, STATE_FILE)
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def save_state(state_dir, state):
+    """Writes the fine-tuning state, replacing the previous file atomically."""
+    state_path = os.path.join(state_dir, STATE_FILE)
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def find_checkpoint(predictor_path):
+    """Returns the fine-tuned Chronos checkpoint folder saved inside a predictor folder.
+
+    Args:
+        predictor_path (str): Folder of a predictor fitted with `fine_tune=True`.
+
+    Returns:
+        str: Checkpoint folder, usable as the `model_path` of a Chronos model.
+    """
+    checkpoints = glob.glob(os.path.join(predictor_path, "models", "**", "fine-tuned-ckpt"), recursive=True)
+    if not checkpoints:
+        raise FileNotFoundError(f"No fine-tuned Chronos checkpoint found under {predictor_path}")
+    return max(checkpoints, key=os.path.getmtime)
+
+
+def select_training_data(ts_data, cutoffs, context_length, prediction_length, replay_fraction, seed=0, target="site"):
+    """Builds the training set of an incremental round.
+
+    New items are trained on their whole history. Known items are trained on the data appended after
+    their cutoff, preceded by `context_length` steps of context, plus a replay sample of older windows
+    so the model does not forget earlier seasons.
+
+    Args:
+        ts_data (TimeSeriesDataFrame): Full history of all items.
+        cutoffs (Dict[str, str]): Last timestamp trained on per item id (ISO format).
+        context_length (int): Number of steps of context kept before the new data and in each replay window.
+        prediction_length (int): Number of steps forecast by the model.
+        replay_fraction (float): Replayed older rows as a fraction of the new rows.
+        seed (int): Seed of the replay window sampling.
+        target (str): Name of the target column.
+
+    Returns:
+        Optional[TimeSeriesDataFrame]: Training data, or None if no item has new data.
+    """
+    rng = np.random.default_rng(seed)
+    window_length = context_length + prediction_length
+    pieces = {}
+    for item_id in ts_data.item_ids:
+        item_df = ts_data.loc[item_id][[target]]
+        cutoff = cutoffs.get(str(item_id))
+        if cutoff is None:
+            pieces[str(item_id)] = item_df
+            continue
+
+        n_old = int(item_df.index.searchsorted(pd.Timestamp(cutoff), side="right"))
+        n_new = len(item_df) - n_old
+        if n_new <= 0:
+            continue
+        pieces[str(item_id)] = item_df.iloc[max(0, n_old - context_length):]
+
+        # Replay randomly chosen older windows as separate training series
+        n_replay = math.ceil(replay_fraction * n_new / window_length)
+        if n_replay and n_old > window_length:
+            for k, start in enumerate(rng.integers(0, n_old - window_length, size=n_replay)):
+                pieces[f"{item_id}-replay-{k}"] = item_df.iloc[start:start + window_length]
+
+    if not pieces:
+        return None
+    train_df = pd.concat(pieces, names=["item_id", "timestamp"])
+    return TimeSeriesDataFrame(train_df)
+
+
+def incremental_fine_tune(
+    ts_data,
+    state_dir="fleet-model",
+    base_model="bolt_small",
+    prediction_length=96,
+    context_length=2048,
+    replay_fraction=0.25,
+    time_limit=600,
+    target="site",
+):
+    """Fine-tunes Chronos starting from the last round's checkpoint on data appended since then.
+
+    The first round starts from `base_model` and trains on the full history. Every later round
+    resumes from the previous checkpoint and trains only on new data, a replay sample of older data
+    and the full history of items that were not seen before.
+
+    Args:
+        ts_data (TimeSeriesDataFrame): Full history of all items, including the newly arrived data.
+        state_dir (str): Folder holding the fine-tuning rounds and the state file.
+        base_model (str): Chronos model the first round starts from.
+        prediction_length (int): Number of steps forecast by the model.
+        context_length (int): Number of steps of context kept before the new data and in each replay window.
+        replay_fraction (float): Replayed older rows as a fraction of the new rows.
+        time_limit (int): Time budget of the round in seconds.
+        target (str): Name of the target column.
+
+    Returns:
+        TimeSeriesPredictor: Predictor of the latest round.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    state = load_state(state_dir) or {"round": -1, "checkpoint": base_model, "predictor_path": None, "cutoffs": {}}
+
+    train_data = select_training_data(
+        ts_data,
+        state["cutoffs"],
+        context_length,
+        prediction_length,
+        replay_fraction,
+        seed=state["round"] + 1,
+        target=target,
+    )
+    if train_data is None:
+        print("No new data since the last fine-tuning round.")
+        return TimeSeriesPredictor.load(state["predictor_path"])
+
+    round_number = state["round"] + 1
+    predictor = TimeSeriesPredictor(
+        path=os.path.join(state_dir, f"round-{round_number:03d}"),
+        target=target,
+        prediction_length=prediction_length,
+        eval_metric="MAE",
+        freq="15min",
+    )
+    print(f"Fine-tuning round {round_number} from {state['checkpoint']} on {len(train_data)} rows.")
+    predictor.fit(
+        train_data=train_data,
+        hyperparameters={
+            "Chronos": [
+                {
+                    "model_path": state["checkpoint"],
+                    "fine_tune": True,
+                    "ag_args": {"name_suffix": "FineTuned"}
+                },
+            ]
+        },
+        time_limit=time_limit,
+        enable_ensemble=False,
+    )
+
+    last_timestamps = {
+        str(item_id): ts_data.loc[item_id].index.max().isoformat() for item_id in ts_data.item_ids
+    }
+    save_state(state_dir, {
+        "round": round_number,
+        "checkpoint": find_checkpoint(predictor.path),
+        "predictor_path": predictor.path,
+        "cutoffs": {**state["cutoffs"], **last_timestamps},
+    })
+    return predictor
@@ -0,0 +1,470 @@
+"""Vectorized per-step error metrics on (item, origin, step) forecast tensors."""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+class ForecastTensor:
+    """Walk-forward forecasts held as a dense (item, origin, step) float array.
+
+    Origins missing for an item are NaN, so every item shares the same origin axis and all
+    metrics can be computed with array reductions instead of melting and merging frames.
+    """
+
+    def __init__(self, item_ids, origins, values, freq="15min"):
+        """Inits a forecast tensor.
+
+        Args:
+            item_ids (np.ndarray): Item ids along the first axis.
+            origins (pd.DatetimeIndex): UTC start times along the second axis, sorted.
+            values (np.ndarray): Forecasts, shape (n_items, n_origins, n_steps).
+            freq (str): Frequency of the forecast steps.
+        """
+        self.item_ids = np.asarray(item_ids)
+        self.origins = origins
+        self.values = values
+        self.freq = pd.Timedelta(freq)
+
+    @property
+    def n_steps(self):
+        return self.values.shape[2]
+
+    @classmethod
+    def from_frame(cls, walk_df, freq="15min"):
+        """Builds a tensor from the wide walk-forward format (item_id, start_time, target_1..target_N).
+
+        Args:
+            walk_df (pd.DataFrame): Wide walk-forward forecasts. Without an item_id column all rows belong to item 0.
+            freq (str): Frequency of the forecast steps.
+
+        Returns:
+            ForecastTensor: Forecasts of every item and origin.
+        """
+        n_steps = sum(column.startswith("target_") for column in walk_df.columns)
+        target_columns = [f"target_{j + 1}" for j in range(n_steps)]
+        item_column = walk_df["item_id"].to_numpy() if "item_id" in walk_df else np.zeros(len(walk_df), dtype=int)
+        start_times = pd.DatetimeIndex(pd.to_datetime(walk_df["start_time"], utc=True))
+
+        item_ids = np.unique(item_column)
+        origins = start_times.unique().sort_values()
+        values = np.full((len(item_ids), len(origins), n_steps), np.nan)
+        values[np.searchsorted(item_ids, item_column), origins.get_indexer(start_times)] = (
+            walk_df[target_columns].to_numpy(dtype=np.float64)
+        )
+        return cls(item_ids, origins, values, freq=freq)
+
+    def to_frame(self):
+        """Returns the tensor in the wide walk-forward format, dropping missing (item, origin) pairs.
+
+        Returns:
+            pd.DataFrame: One row per forecast origin.
+        """
+        item_idx, origin_idx = np.nonzero(~np.isnan(self.values).all(axis=2))
+        df = pd.DataFrame(
+            self.values[item_idx, origin_idx], columns=[f"target_{j + 1}" for j in range(self.n_steps)]
+        )
+        df.insert(0, "start_time", self.origins[origin_idx])
+        df.insert(0, "item_id", self.item_ids[item_idx])
+        return df
+
+    def grid_start(self):
+        """Returns the first timestamp covered by any forecast.
+
+        Raises:
+            ValueError: If the tensor has no origins, so there is no grid to place actuals on.
+        """
+        if len(self.origins) == 0:
+            raise ValueError("Forecast tensor has no origins to score")
+        return self.origins[0]
+
+    def grid_length(self):
+        """Returns the number of steps from the first origin to the end of the last forecast."""
+        return int((self.origins[-1] - self.origins[0]) / self.freq) + self.n_steps
+
+    def grid_positions(self):
+        """Returns, per (origin, step), the position of the forecast timestamp on the regular time grid.
+
+        Returns:
+            np.ndarray: Integer positions, shape (n_origins, n_steps).
+        """
+        origin_pos = np.asarray((self.origins - self.grid_start()) / self.freq).astype(np.int64)
+        return origin_pos[:, None] + np.arange(self.n_steps)[None, :]
+
+
+def build_actual_grid(actual_df, item_ids, start, length, freq="15min"):
+    """Places actuals on a regular (item, time) grid so they can be gathered by index arithmetic.
+
+    Args:
+        actual_df (pd.DataFrame): Long actuals with columns item_id, timestamp (UTC) and actual.
+        item_ids (np.ndarray): Item ids along the first axis of the grid.
+        start (pd.Timestamp): Timestamp of grid position 0.
+        length (int): Number of grid positions.
+        freq (str): Grid frequency.
+
+    Returns:
+        np.ndarray: Actuals, shape (n_items, length). Missing intervals are NaN.
+    """
+    grid = np.full((len(item_ids), length), np.nan)
+    item_idx = pd.Index(item_ids).get_indexer(actual_df["item_id"])
+    offsets = (pd.DatetimeIndex(actual_df["timestamp"]) - start) / pd.Timedelta(freq)
+    positions = np.asarray(offsets)
+    keep = (item_idx >= 0) & (positions >= 0) & (positions < length) & (positions == np.floor(positions))
+    grid[item_idx[keep], positions[keep].astype(np.int64)] = actual_df["actual"].to_numpy(dtype=np.float64)[keep]
+    return grid
+
+
+def gather_actuals(tensor, actual_df):
+    """Returns the actual value at every forecast timestamp of a tensor.
+
+    Args:
+        tensor (ForecastTensor): Walk-forward forecasts.
+        actual_df (pd.DataFrame): Long actuals with columns item_id, timestamp (UTC) and actual.
+
+    Returns:
+        np.ndarray: Actuals aligned with `tensor.values`, shape (n_items, n_origins, n_steps).
+    """
+    grid = build_actual_grid(actual_df, tensor.item_ids, tensor.grid_start(), tensor.grid_length(), tensor.freq)
+    return grid[:, tensor.grid_positions()]
+
+
+def align_tensors(*tensors):
+    """Restricts forecast tensors to the (item, origin) pairs forecast by all of them.
+
+    The returned tensors share their item and origin axes, so one `gather_actuals` serves them all.
+    Pairs missing from any tensor are set to NaN in every tensor.
+
+    Args:
+        *tensors (ForecastTensor): Forecasts of the same steps and frequency, e.g. of two models.
+
+    Returns:
+        List[ForecastTensor]: Aligned tensors, in the order given.
+    """
+    item_ids = tensors[0].item_ids
+    origins = tensors[0].origins
+    for tensor in tensors[1:]:
+        item_ids = np.intersect1d(item_ids, tensor.item_ids)
+        origins = origins.intersection(tensor.origins).sort_values()
+
+    values = [
+        tensor.values[np.ix_(pd.Index(tensor.item_ids).get_indexer(item_ids), tensor.origins.get_indexer(origins))]
+        for tensor in tensors
+    ]
+    missing = np.zeros((len(item_ids), len(origins)), dtype=bool)
+    for tensor_values in values:
+        missing |= np.isnan(tensor_values).all(axis=2)
+    for tensor_values in values:
+        tensor_values[missing] = np.nan
+    return [ForecastTensor(item_ids, origins, v, freq=tensor.freq) for tensor, v in zip(tensors, values)]
+
+
+def compute_errors(forecast, actual, axis, peak_quantile=0.9, weights=None):
+    """Computes MAE, RMSE, MAPE, bias and peak MAE of aligned forecast and actual arrays in one pass.
+
+    Intervals where either value is NaN are ignored. MAPE skips zero actuals. Peak MAE is the MAE over
+    intervals whose actual is at or above the item's `peak_quantile` quantile of actuals.
+
+    Args:
+        forecast (np.ndarray): Forecasts, shape (n_items, n_origins, n_steps).
+        actual (np.ndarray): Actuals aligned with `forecast`.
+        axis (Tuple[int, ...]): Axes reduced, e.g. (1,) for per-step and (1, 2) for per-item metrics.
+        peak_quantile (float): Quantile of the actuals above which an interval counts as a peak.
+        weights (Optional[np.ndarray]): Weight of every origin in the averages, e.g.
+            `origin_sampling.stratum_weights` of a stratified sample. Equal weights if None.
+
+    Returns:
+        Dict[str, np.ndarray]: count, mae, rmse, mape, bias and peak_mae reduced over `axis`. The count is the
+            number of scored intervals, whatever the weights.
+    """
+    error = forecast - actual
+    valid = ~np.isnan(error)
+    count = valid.sum(axis=axis)
+    weight = 1.0 if weights is None else np.asarray(weights, dtype=np.float64)[None, :, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        threshold = np.nanquantile(np.where(valid, actual, np.nan), peak_quantile, axis=(1, 2), keepdims=True)
+        abs_error = np.where(valid, np.abs(error), 0.0)
+        nonzero = valid & (actual != 0)
+        peak = valid & (actual >= threshold)
+        ape = np.where(nonzero, abs_error / np.where(nonzero, np.abs(actual), 1.0), 0.0)
+        total = (valid * weight).sum(axis=axis)
+        return {
+            "count": count,
+            "mae": (abs_error * weight).sum(axis=axis) / total,
+            "rmse": np.sqrt((np.where(valid, error**2, 0.0) * weight).sum(axis=axis) / total),
+            "mape": 100 * (ape * weight).sum(axis=axis) / (nonzero * weight).sum(axis=axis),
+            "bias": (np.where(valid, error, 0.0) * weight).sum(axis=axis) / total,
+            "peak_mae": (np.where(peak, abs_error, 0.0) * weight).sum(axis=axis) / (peak * weight).sum(axis=axis),
+        }
+
+
+def errors_by_step(tensor, actual, model_name, peak_quantile=0.9):
+    """Computes the error metrics of every item and forecast step.
+
+    Args:
+        tensor (ForecastTensor): Walk-forward forecasts.
+        actual (np.ndarray): Output of `gather_actuals`.
+        model_name (str): Suffix of the metric columns, e.g. "chronos" gives mae_chronos.
+        peak_quantile (float): Quantile of the actuals above which an interval counts as a peak.
+
+    Returns:
+        pd.DataFrame: Columns item_id, step and one column per metric.
+    """
+    errors = compute_errors(tensor.values, actual, axis=(1,), peak_quantile=peak_quantile)
+    n_items, n_steps = errors["mae"].shape
+    df = pd.DataFrame({
+        "item_id": np.repeat(tensor.item_ids, n_steps),
+        "step": np.tile(np.arange(1, n_steps + 1), n_items),
+    })
+    for name, values in errors.items():
+        df[f"{name}_{model_name}"] = values.ravel()
+    return df
+
+
+def errors_by_item(tensor, actual, model_name, peak_quantile=0.9):
+    """Computes the error metrics of every item over all origins and steps.
+
+    Args:
+        tensor (ForecastTensor): Walk-forward forecasts.
+        actual (np.ndarray): Output of `gather_actuals`.
+        model_name (str): Suffix of the metric columns, e.g. "chronos" gives mae_chronos.
+        peak_quantile (float): Quantile of the actuals above which an interval counts as a peak.
+
+    Returns:
+        pd.DataFrame: Columns item_id and one column per metric.
+    """
+    errors = compute_errors(tensor.values, actual, axis=(1, 2), peak_quantile=peak_quantile)
+    df = pd.DataFrame({"item_id": tensor.item_ids})
+    for name, values in errors.items():
+        df[f"{name}_{model_name}"] = values
+    return df
+
+
+def bootstrap_block(origins, min_blocks=10, blocks=("1D", "6h", "1h")):
+    """Returns the longest block length that splits the origins into at least `min_blocks` blocks.
+
+    Args:
+        origins (pd.DatetimeIndex): Forecast origins.
+        min_blocks (int): Fewest blocks wanted.
+        blocks (Sequence[str]): Candidate block lengths, longest first.
+
+    Returns:
+        str: The first candidate with enough blocks, or the last candidate if none has enough.
+    """
+    for block in blocks:
+        if origins.floor(block).nunique() >= min_blocks:
+            return block
+    return blocks[-1]
+
+
+def bootstrap_errors(tensor, actual, model_name, weights=None, n_resamples=1000, confidence=0.95, block=None,
+                     peak_quantile=0.9, seed=0, min_blocks=10):
+    """Computes the error metrics of every item with block-bootstrap confidence intervals over the origins.
+
+    Forecasts from nearby origins overlap, so origins are resampled in blocks (e.g. whole days). Every resample
+    is scored with `compute_errors`, the same metrics as `errors_by_item`.
+
+    Args:
+        tensor (ForecastTensor): Walk-forward forecasts.
+        actual (np.ndarray): Output of `gather_actuals`.
+        model_name (str): Suffix of the metric columns, e.g. "chronos" gives mae_chronos, mae_chronos_low and
+            mae_chronos_high.
+        weights (Optional[np.ndarray]): Weight of every origin, e.g. `origin_sampling.stratum_weights` of a
+            stratified sample. Equal weights if None.
+        n_resamples (int): Number of bootstrap resamples.
+        confidence (float): Confidence level of the intervals.
+        block (Optional[str]): Length of the blocks of consecutive origins resampled together. If None,
+            `bootstrap_block` picks the longest of a day, 6 hours and an hour that gives `min_blocks` blocks.
+        peak_quantile (float): Quantile of the actuals above which an interval counts as a peak.
+        seed (int): Seed of the resampling.
+        min_blocks (int): Fewest blocks that give usable intervals. With fewer, e.g. a test window of a few hours,
+            the intervals are still computed but a warning says they are unreliable.
+
+    Returns:
+        pd.DataFrame: Columns item_id, count and, per metric, the estimate and its interval bounds.
+    """
+    block = block or bootstrap_block(tensor.origins, min_blocks)
+    block_codes, blocks = pd.factorize(tensor.origins.floor(block))
+    if len(blocks) < min_blocks:
+        warnings.warn(f"Only {len(blocks)} blocks of {block} to resample, the confidence intervals are unreliable "
+                      f"below {min_blocks}: use a longer test window or a shorter block", stacklevel=2)
+    weights = np.ones(len(tensor.origins)) if weights is None else np.asarray(weights, dtype=np.float64)
+    block_origins = [np.flatnonzero(block_codes == k) for k in range(len(blocks))]
+
+    def item_errors(origin_idx):
+        return compute_errors(tensor.values[:, origin_idx], actual[:, origin_idx], axis=(1, 2),
+                              peak_quantile=peak_quantile, weights=weights[origin_idx])
+
+    estimate = item_errors(np.arange(len(tensor.origins)))
+    rng = np.random.default_rng(seed)
+    resampled = []
+    for draws in rng.integers(0, len(blocks), size=(n_resamples, len(blocks))):
+        resampled.append(item_errors(np.concatenate([block_origins[k] for k in draws])))
+
+    alpha = (1 - confidence) / 2
+    df = pd.DataFrame({"item_id": tensor.item_ids, "count": estimate.pop("count")})
+    for name, values in estimate.items():
+        low, high = np.nanquantile(np.stack([errors[name] for errors in resampled], axis=1), [alpha, 1 - alpha],
+                                   axis=1)
+        df[f"{name}_{model_name}"] = values
+        df[f"{name}_{model_name}_low"] = low
+        df[f"{name}_{model_name}_high"] = high
+    return df
+
+
+def average_forecast_by_timestamp(tensor, actual):
+    """Averages, per item and timestamp, the forecasts of every origin that covers the timestamp.
+
+    Args:
+        tensor (ForecastTensor): Walk-forward forecasts.
+        actual (np.ndarray): Output of `gather_actuals`.
+
+    Returns:
+        pd.DataFrame: Columns item_id, timestamp, actual and forecast (mean over origins).
+    """
+    positions = tensor.grid_positions().ravel()
+    length = tensor.grid_length()
+    frames = []
+    for k, item_id in enumerate(tensor.item_ids):
+        valid = ~np.isnan(tensor.values[k] - actual[k]).ravel()
+        total = np.bincount(positions[valid], weights=tensor.values[k].ravel()[valid], minlength=length)
+        count = np.bincount(positions[valid], minlength=length)
+        actual_grid = np.full(length, np.nan)
+        actual_grid[positions[valid]] = actual[k].ravel()[valid]
+        covered = count > 0
+        frames.append(pd.DataFrame({
+            "item_id": item_id,
+            "timestamp": tensor.grid_start() + np.flatnonzero(covered) * tensor.freq,
+            "actual": actual_grid[covered],
+            "forecast": total[covered] / count[covered],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+class OnlineEvaluator:
+    """Running per-(item, step) error aggregates, updated as each batch of forecasts lands.
+
+    Absolute and squared errors are kept as running sums, and the mean and variance of the error are
+    merged batch by batch with Welford's parallel update, so live MAE, RMSE, bias and error spread are
+    available at any point of a backtest without re-reading the forecasts.
+    """
+
+    def __init__(self, actual_df, prediction_length, freq="15min", snapshot_path=None, snapshot_every=10):
+        """Inits the evaluator with the actuals held in memory.
+
+        Args:
+            actual_df (pd.DataFrame): Long actuals with columns item_id, timestamp (UTC) and actual.
+            prediction_length (int): Number of steps forecast at each origin.
+            freq (str): Frequency of the forecast steps.
+            snapshot_path (Optional[str]): CSV the current metrics are written to every `snapshot_every` updates.
+            snapshot_every (int): Number of updates between snapshots.
+        """
+        self.freq = pd.Timedelta(freq)
+        self.prediction_length = prediction_length
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self.n_updates = 0
+
+        # One actual grid per item, starting at the item's first timestamp
+        self.item_ids = np.unique(actual_df["item_id"].to_numpy())
+        self._grid_start = []
+        self._grids = []
+        for item_id in self.item_ids:
+            item_df = actual_df[actual_df["item_id"] == item_id]
+            start = item_df["timestamp"].min()
+            length = int((item_df["timestamp"].max() - start) / self.freq) + 1
+            self._grid_start.append(start)
+            self._grids.append(build_actual_grid(item_df, [item_id], start, length, freq)[0])
+
+        shape = (len(self.item_ids), prediction_length)
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.sum_abs = np.zeros(shape)
+        self.sum_sq = np.zeros(shape)
+        self.mean_error = np.zeros(shape)
+        self.m2_error = np.zeros(shape)
+
+    def update(self, batch):
+        """Adds a batch of forecasts to the running aggregates.
+
+        Args:
+            batch (ForecastBatch): Forecasts with `item_ids`, UTC `start_times` and `mean` (n_origins, n_steps).
+        """
+        item_ids = np.asarray(batch.item_ids)
+        start_times = pd.DatetimeIndex(batch.start_times)
+        forecasts = np.asarray(batch.mean, dtype=np.float64)[:, :self.prediction_length]
+        steps = np.arange(forecasts.shape[1])
+
+        for item_id in np.unique(item_ids):
+            k = np.searchsorted(self.item_ids, item_id)
+            if k == len(self.item_ids) or self.item_ids[k] != item_id:
+                continue
+            rows = item_ids == item_id
+            grid = self._grids[k]
+            positions = np.asarray((start_times[rows] - self._grid_start[k]) / self.freq).astype(np.int64)
+            positions = positions[:, None] + steps[None, :]
+            in_range = (positions >= 0) & (positions < len(grid))
+            actual = np.where(in_range, grid[np.clip(positions, 0, len(grid) - 1)], np.nan)
+            self._add(k, forecasts[rows] - actual)
+
+        self.n_updates += 1
+        if self.snapshot_path is not None and self.n_updates % self.snapshot_every == 0:
+            self.snapshot().to_csv(self.snapshot_path, index=False)
+
+    def update_frame(self, walk_df):
+        """Adds forecasts in the wide walk-forward format, e.g. those of a resumed `ForecastLog`.
+
+        Args:
+            walk_df (pd.DataFrame): Columns item_id, start_time and target_1..target_N.
+        """
+        if not walk_df.empty:
+            self.update(FrameBatch(walk_df))
+
+    def _add(self, k, error):
+        valid = ~np.isnan(error)
+        n_b = valid.sum(axis=0)
+        if not n_b.any():
+            return
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(valid, error, 0.0).sum(axis=0) / n_b
+            m2_b = np.where(valid, (error - mean_b) ** 2, 0.0).sum(axis=0)
+
+            # Welford / Chan parallel merge of the batch into the running mean and M2
+            n_a = self.count[k]
+            n = n_a + n_b
+            delta = np.where(n_b > 0, mean_b - self.mean_error[k], 0.0)
+            self.mean_error[k] = np.where(n > 0, self.mean_error[k] + delta * n_b / n, 0.0)
+            self.m2_error[k] = self.m2_error[k] + np.where(n_b > 0, m2_b + delta**2 * n_a * n_b / n, 0.0)
+
+        self.count[k] = n
+        self.sum_abs[k] += np.where(valid, np.abs(error), 0.0).sum(axis=0)
+        self.sum_sq[k] += np.where(valid, error**2, 0.0).sum(axis=0)
+
+    def snapshot(self):
+        """Returns the current per-(item, step) metrics.
+
+        Returns:
+            pd.DataFrame: Columns item_id, step, count, mae, rmse, bias and error_std.
+        """
+        n_items, n_steps = self.count.shape
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return pd.DataFrame({
+                "item_id": np.repeat(self.item_ids, n_steps),
+                "step": np.tile(np.arange(1, n_steps + 1), n_items),
+                "count": self.count.ravel(),
+                "mae": (self.sum_abs / self.count).ravel(),
+                "rmse": np.sqrt(self.sum_sq / self.count).ravel(),
+                "bias": np.where(self.count > 0, self.mean_error, np.nan).ravel(),
+                "error_std": np.sqrt(self.m2_error / (self.count - 1)).ravel(),
+            })
+
+
+class FrameBatch:
+    """Adapts wide walk-forward rows to the attributes `OnlineEvaluator.update` and `ForecastStore.append` read."""
+
+    quantiles = None
+    quantile_levels = ()
+
+    def __init__(self, df):
+        n_steps = sum(column.startswith("target_") for column in df.columns)
+        self.item_ids = df["item_id"].to_numpy()
+        self.start_times = pd.DatetimeIndex(pd.to_datetime(df["start_time"], utc=True))
+        self.mean = df[[f"target_{j + 1}" for j in range(n_steps)]].to_numpy(dtype=np.float64)
@@ -0,0 +1,134 @@
+"""Cache of trained TimeSeriesPredictor folders keyed by training data and settings."""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import autogluon.timeseries
+import pandas as pd
+from autogluon.timeseries import TimeSeriesPredictor
+
+# Marker written into a predictor folder once its fit has finished
+COMPLETE_MARKER = ".complete"
+
+
+def fingerprint_data(ts_data):
+    """Hashes the values and index of a TimeSeriesDataFrame.
+
+    Args:
+        ts_data (TimeSeriesDataFrame): Training data.
+
+    Returns:
+        str: Hex digest of the data.
+    """
+    row_hashes = pd.util.hash_pandas_object(pd.DataFrame(ts_data), index=True).to_numpy()
+    digest = hashlib.sha256(row_hashes.tobytes())
+    digest.update(json.dumps(list(map(str, ts_data.columns))).encode())
+    return digest.hexdigest()
+
+
+def fingerprint(ts_data, predictor_kwargs, fit_kwargs):
+    """Builds the cache key of a fit.
+
+    The key covers the training data, the predictor settings (target, prediction length, frequency,
+    eval metric), the fit settings (presets, hyperparameters, time limit) and the AutoGluon version.
+
+    Args:
+        ts_data (TimeSeriesDataFrame): Training data.
+        predictor_kwargs (Dict): Keyword arguments of `TimeSeriesPredictor`.
+        fit_kwargs (Dict): Keyword arguments of `TimeSeriesPredictor.fit`, without the training data.
+
+    Returns:
+        str: Hex digest identifying the trained predictor.
+    """
+    settings = {
+        "predictor": predictor_kwargs,
+        "fit": fit_kwargs,
+        "autogluon": autogluon.timeseries.__version__,
+    }
+    digest = hashlib.sha256(fingerprint_data(ts_data).encode())
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:32]
+
+
+def folder_size(path):
+    """Returns the total size in bytes of the files under a folder."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class ModelCache:
+    """Reuses saved predictors whose training data and settings have not changed.
+
+    Every entry is a predictor folder named after its fingerprint. A hit loads the folder instead of
+    fitting again; entries are evicted least-recently-used first once the cache grows past `max_size_gb`.
+    """
+
+    def __init__(self, directory="model-cache", max_size_gb=20.0):
+        """Inits the model cache.
+
+        Args:
+            directory (str): Folder holding the cached predictor folders.
+            max_size_gb (float): Size above which the least recently used entries are deleted.
+        """
+        self.directory = directory
+        self.max_size_bytes = int(max_size_gb * 1024**3)
+        os.makedirs(directory, exist_ok=True)
+
+    def get_or_fit(self, ts_data, predictor_kwargs, fit_kwargs):
+        """Loads the cached predictor for this data and settings, fitting and caching it on a miss.
+
+        Args:
+            ts_data (TimeSeriesDataFrame): Training data.
+            predictor_kwargs (Dict): Keyword arguments of `TimeSeriesPredictor`, without `path`.
+            fit_kwargs (Dict): Keyword arguments of `TimeSeriesPredictor.fit`, without the training data.
+
+        Returns:
+            TimeSeriesPredictor: Trained predictor.
+        """
+        key = fingerprint(ts_data, predictor_kwargs, fit_kwargs)
+        path = os.path.join(self.directory, key)
+        marker = os.path.join(path, COMPLETE_MARKER)
+
+        if os.path.exists(marker):
+            print(f"Model cache hit: {path}")
+            os.utime(marker)  # mark as recently used
+            return TimeSeriesPredictor.load(path)
+
+        print(f"Model cache miss, fitting into {path}")
+        # A folder without the marker is left over from an interrupted fit
+        shutil.rmtree(path, ignore_errors=True)
+        predictor = TimeSeriesPredictor(path=path, **predictor_kwargs)
+        predictor.fit(ts_data, **fit_kwargs)
+        with open(marker, "w") as f:
+            f.write(str(time.time()))
+
+        self.evict(keep=key)
+        return predictor
+
+    def evict(self, keep=None):
+        """Deletes least recently used entries until the cache fits in `max_size_gb`.
+
+        Args:
+            keep (Optional[str]): Key that must not be evicted, e.g. the entry just used.
+        """
+        entries = []
+        for key in os.listdir(self.directory):
+            path = os.path.join(self.directory, key)
+            marker = os.path.join(path, COMPLETE_MARKER)
+            if os.path.isdir(path) and os.path.exists(marker):
+                entries.append((os.path.getmtime(marker), key, folder_size(path)))
+
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.max_size_bytes:
+                break
+            if key == keep:
+                continue
+            print(f"Evicting cached model {key} ({size / 1024**2:.0f} MB)")
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            total -= size
@@ -0,0 +1,101 @@
+"""Forecast origin selection for backtests: strides, fixed times of day and stratified sampling."""
+import numpy as np
+import pandas as pd
+
+from peak_windows import PEAK_END_HOUR, PEAK_START_HOUR
+
+
+def candidate_origins(test_start_dt, test_end_dt, prediction_length, freq="15min"):
+    """Returns every walk-forward origin of a test window, as `get_origins` does for a complete series.
+
+    Args:
+        test_start_dt (datetime): First forecast origin, UTC.
+        test_end_dt (datetime): End of the test window, UTC; the last forecast must end before it.
+        prediction_length (int): Number of steps forecast at each origin.
+        freq (str): Frequency of the site series.
+
+    Returns:
+        pd.DatetimeIndex: UTC origins.
+    """
+    freq = pd.Timedelta(freq)
+    test_start = pd.Timestamp(test_start_dt).tz_localize("UTC")
+    test_end = pd.Timestamp(test_end_dt).tz_localize("UTC")
+    return pd.date_range(test_start, test_end - prediction_length * freq, freq=freq)
+
+
+def origin_strata(origins, timezone="America/Chicago"):
+    """Labels every origin with its local month, weekday/weekend and peak/off-peak stratum.
+
+    Args:
+        origins (pd.DatetimeIndex): UTC origins.
+        timezone (str): Local timezone of the months, days and peak window.
+
+    Returns:
+        np.ndarray: Labels such as "2025-01/weekday/peak"; an origin is peak if its local hour is in the
+            peak window of `peak_windows`.
+    """
+    local = pd.DatetimeIndex(origins).tz_convert(timezone)
+    month = local.strftime("%Y-%m")
+    day_type = np.where(local.dayofweek >= 5, "weekend", "weekday")
+    period = np.where((local.hour >= PEAK_START_HOUR) & (local.hour <= PEAK_END_HOUR), "peak", "off-peak")
+    return np.asarray(month, dtype=object) + "/" + day_type.astype(object) + "/" + period.astype(object)
+
+
+def sample_origins(origins, stride=None, times_of_day=None, per_stratum=None, timezone="America/Chicago", seed=0):
+    """Selects the origins of a backtest, so its cost is a fixed fraction of an exhaustive walk-forward.
+
+    The stride and time-of-day filters are applied first, then at most `per_stratum` origins are drawn without
+    replacement from every stratum of `origin_strata`.
+
+    Args:
+        origins (pd.DatetimeIndex): Candidate UTC origins, e.g. from `candidate_origins`.
+        stride (Optional[str]): Keep origins on multiples of this interval from local midnight, e.g. "1h".
+        times_of_day (Optional[Sequence[str]]): Keep only these local times, e.g. ["06:00", "12:00"].
+        per_stratum (Optional[int]): Maximum number of origins drawn from each stratum. All if None.
+        timezone (str): Local timezone of the stride, times of day and strata.
+        seed (int): Seed of the stratified draw.
+
+    Returns:
+        pd.DatetimeIndex: Selected UTC origins, sorted.
+    """
+    origins = pd.DatetimeIndex(origins)
+    local = origins.tz_convert(timezone)
+    since_midnight = local - local.normalize()
+    keep = np.ones(len(origins), dtype=bool)
+    if stride is not None:
+        keep &= np.asarray(since_midnight % pd.Timedelta(stride) == pd.Timedelta(0))
+    if times_of_day:
+        times = pd.to_timedelta([time if time.count(":") == 2 else f"{time}:00" for time in times_of_day])
+        keep &= np.asarray(since_midnight.isin(times))
+    positions = np.flatnonzero(keep)
+
+    if per_stratum is not None:
+        rng = np.random.default_rng(seed)
+        # A random order, stably sorted by stratum: the first `per_stratum` of each stratum are a uniform draw
+        shuffled = rng.permutation(positions)
+        codes = pd.factorize(origin_strata(origins[shuffled], timezone))[0]
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        rank = np.arange(len(codes)) - np.searchsorted(codes, codes)
+        positions = np.sort(shuffled[order][rank < per_stratum])
+    return origins[positions]
+
+
+def stratum_weights(selected, candidates, timezone="America/Chicago"):
+    """Weights that make metrics over sampled origins estimate the metrics over all candidate origins.
+
+    Each selected origin stands for the candidates of its stratum: its weight is the number of candidates in the
+    stratum divided by the number selected.
+
+    Args:
+        selected (pd.DatetimeIndex): Origins of the backtest.
+        candidates (pd.DatetimeIndex): Origins of the exhaustive walk-forward.
+        timezone (str): Local timezone of the strata.
+
+    Returns:
+        np.ndarray: Weight of every selected origin.
+    """
+    population = pd.Series(origin_strata(candidates, timezone)).value_counts()
+    labels = pd.Series(origin_strata(selected, timezone))
+    sample = labels.value_counts()
+    return (labels.map(population).fillna(0) / labels.map(sample)).to_numpy(dtype=np.float64)
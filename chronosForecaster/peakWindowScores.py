@@ -0,0 +1,49 @@
+# This script scores how well walk-forward forecasts catch peak periods.
+# Peaks are intervals in the 15:00-18:59 local window above the monthly adjusted threshold of NYISO.py, computed
+# from the site actuals. Predicted peaks (forecast above the threshold) are compared with realized ones per site
+# and forecast step. `--mask-quality` leaves intervals flagged by data_quality.py out of the scores.
+#
+# Example:
+#   python peakWindowScores.py --store output-mul/forecast_store --model-name chronos
+import argparse
+import os
+
+from data_quality import FLAGS, flag_bits, mask_sites
+from dataset import SITE_FILES, load_sites
+from forecast_store import ForecastStore
+from metrics import gather_actuals
+from peak_windows import PEAK_END_HOUR, PEAK_START_HOUR, monthly_thresholds, peak_scores
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precision and recall of forecast peak periods per site and step.")
+    parser.add_argument("--store", default="output-mul/forecast_store", help="Forecast store of the walk-forward run")
+    parser.add_argument("--model-name", default="chronos", help="Suffix of the score columns")
+    parser.add_argument("--output", default=None, help="Defaults to peak_scores_<model-name>.csv next to the store")
+    parser.add_argument("--timezone", default="America/Chicago", help="Local timezone of the peak window")
+    parser.add_argument("--quantile", type=float, default=0.99, help="Quantile of the monthly base threshold")
+    parser.add_argument("--start-hour", type=int, default=PEAK_START_HOUR)
+    parser.add_argument("--end-hour", type=int, default=PEAK_END_HOUR)
+    parser.add_argument("--mask-quality", nargs="+", default=None, choices=["bad", *FLAGS],
+                        help="Data-quality flags whose intervals are left out of the thresholds and scores")
+    args = parser.parse_args()
+
+    actual_df = load_sites(SITE_FILES, columns=("site",)).rename(columns={"site": "actual"})
+    if args.mask_quality:
+        actual_df = mask_sites(actual_df, SITE_FILES, flag_bits(args.mask_quality), value_column="actual")
+    thresholds = monthly_thresholds(actual_df, timezone=args.timezone, quantile=args.quantile)
+
+    tensor = ForecastStore(args.store, resume=True).to_tensor("mean")
+    actual = gather_actuals(tensor, actual_df)
+    scores = peak_scores(tensor, actual, thresholds, timezone=args.timezone, start_hour=args.start_hour,
+                         end_hour=args.end_hour, model_name=args.model_name)
+
+    output = args.output or os.path.join(os.path.dirname(os.path.normpath(args.store)),
+                                         f"peak_scores_{args.model_name}.csv")
+    scores.to_csv(output, index=False)
+
+    # Overall precision and recall per site, over all steps
+    counts = scores.groupby("item_id")[[f"true_positives_{args.model_name}", f"false_positives_{args.model_name}",
+                                        f"false_negatives_{args.model_name}"]].sum()
+    tp, fp, fn = (counts.iloc[:, k] for k in range(3))
+    print(counts.assign(precision=tp / (tp + fp), recall=tp / (tp + fn)).to_string())
+    print(f"Peak scores saved to {output}")
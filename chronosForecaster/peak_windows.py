@@ -0,0 +1,122 @@
+"""Peak-window prediction from walk-forward forecasts, using the NYISO monthly adjusted-threshold logic."""
+import numpy as np
+import pandas as pd
+
+# Peak hours window of NYISO.py, inclusive, in local time
+PEAK_START_HOUR = 15
+PEAK_END_HOUR = 18
+
+
+def monthly_thresholds(actual_df, timezone="America/Chicago", quantile=0.99, yoy_weight=0.5, offset=1000.0):
+    """Computes the monthly adjusted peak threshold of every item, as NYISO.py does for the NYISO load.
+
+    The base threshold is the `quantile` of the month's load. If the same month of the previous year exists,
+    the adjusted threshold is `base * (1 + yoy_weight * yoy_change) + offset`, otherwise it is the base.
+
+    Args:
+        actual_df (pd.DataFrame): Long actuals with columns item_id, timestamp (UTC) and actual.
+        timezone (str): Local timezone the months are taken in.
+        quantile (float): Quantile of the monthly load used as the base threshold.
+        yoy_weight (float): Weight of the year-over-year change of the base threshold.
+        offset (float): Added to the adjusted threshold.
+
+    Returns:
+        pd.DataFrame: Columns item_id, year, month, base_threshold and adjusted_threshold.
+    """
+    local = pd.DatetimeIndex(actual_df["timestamp"]).tz_convert(timezone)
+    df = pd.DataFrame({
+        "item_id": actual_df["item_id"].to_numpy(),
+        "year": local.year,
+        "month": local.month,
+        "actual": actual_df["actual"].to_numpy(dtype=np.float64),
+    })
+    thresholds = df.groupby(["item_id", "year", "month"])["actual"].quantile(quantile).rename("base_threshold")
+    thresholds = thresholds.reset_index()
+
+    prior = thresholds[["item_id", "year", "month", "base_threshold"]].rename(columns={"base_threshold": "prior"})
+    prior["year"] += 1
+    thresholds = thresholds.merge(prior, on=["item_id", "year", "month"], how="left")
+    yoy_change = (thresholds["base_threshold"] - thresholds["prior"]) / thresholds["prior"]
+    thresholds["adjusted_threshold"] = np.where(
+        thresholds["prior"].notna(),
+        thresholds["base_threshold"] * (1 + yoy_weight * yoy_change) + offset,
+        thresholds["base_threshold"],
+    )
+    return thresholds.drop(columns="prior")
+
+
+def peak_flags(tensor, values, thresholds, timezone="America/Chicago", start_hour=PEAK_START_HOUR,
+               end_hour=PEAK_END_HOUR):
+    """Flags the forecast timestamps of a tensor that fall in the peak window above the monthly threshold.
+
+    Args:
+        tensor (ForecastTensor): Forecasts whose origins and steps define the timestamps.
+        values (np.ndarray): Load at every forecast timestamp, shape (n_items, n_origins, n_steps), e.g.
+            `tensor.values` for predicted peaks or `gather_actuals(tensor, actual_df)` for realized ones.
+        thresholds (pd.DataFrame): Output of `monthly_thresholds`.
+        timezone (str): Local timezone of the peak window and months.
+        start_hour (int): First hour of the peak window.
+        end_hour (int): Last hour of the peak window, inclusive.
+
+    Returns:
+        np.ndarray: Boolean flags, shape (n_items, n_origins, n_steps). NaN loads are never flagged.
+    """
+    # Local hour and month of every (origin, step), computed once for all items
+    positions = tensor.grid_positions()
+    grid = pd.date_range(tensor.grid_start(), periods=tensor.grid_length(), freq=tensor.freq).tz_convert(timezone)
+    in_window = ((grid.hour >= start_hour) & (grid.hour <= end_hour))[positions]
+    month_keys = np.asarray(grid.year * 12 + grid.month - 1)[positions]
+
+    # Threshold table indexed by (item, month key), NaN where a month has no threshold
+    first_key = month_keys.min()
+    n_keys = month_keys.max() - first_key + 1
+    table = np.full((len(tensor.item_ids), n_keys), np.nan)
+    item_idx = pd.Index(tensor.item_ids).get_indexer(thresholds["item_id"])
+    keys = thresholds["year"].to_numpy() * 12 + thresholds["month"].to_numpy() - 1 - first_key
+    keep = (item_idx >= 0) & (keys >= 0) & (keys < n_keys)
+    table[item_idx[keep], keys[keep]] = thresholds["adjusted_threshold"].to_numpy()[keep]
+
+    threshold = table[:, month_keys - first_key]
+    with np.errstate(invalid="ignore"):
+        return in_window[None, :, :] & (values > threshold)
+
+
+def peak_scores(tensor, actual, thresholds, timezone="America/Chicago", start_hour=PEAK_START_HOUR,
+                end_hour=PEAK_END_HOUR, model_name=None):
+    """Scores predicted peak intervals against realized ones per item and forecast step.
+
+    Args:
+        tensor (ForecastTensor): Walk-forward forecasts.
+        actual (np.ndarray): Output of `gather_actuals(tensor, actual_df)`.
+        thresholds (pd.DataFrame): Output of `monthly_thresholds`.
+        timezone (str): Local timezone of the peak window and months.
+        start_hour (int): First hour of the peak window.
+        end_hour (int): Last hour of the peak window, inclusive.
+        model_name (Optional[str]): Suffix of the score columns, e.g. "chronos". No suffix if None.
+
+    Returns:
+        pd.DataFrame: Columns item_id, step, true_positives, false_positives, false_negatives, precision
+            and recall. Precision or recall is NaN when nothing was predicted or realized.
+    """
+    scored = ~np.isnan(tensor.values) & ~np.isnan(actual)
+    predicted = peak_flags(tensor, tensor.values, thresholds, timezone, start_hour, end_hour) & scored
+    realized = peak_flags(tensor, actual, thresholds, timezone, start_hour, end_hour) & scored
+
+    true_positives = (predicted & realized).sum(axis=1)
+    false_positives = (predicted & ~realized).sum(axis=1)
+    false_negatives = (~predicted & realized).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision = true_positives / (true_positives + false_positives)
+        recall = true_positives / (true_positives + false_negatives)
+
+    suffix = f"_{model_name}" if model_name else ""
+    n_items, n_steps = true_positives.shape
+    return pd.DataFrame({
+        "item_id": np.repeat(tensor.item_ids, n_steps),
+        "step": np.tile(np.arange(1, n_steps + 1), n_items),
+        f"true_positives{suffix}": true_positives.ravel(),
+        f"false_positives{suffix}": false_positives.ravel(),
+        f"false_negatives{suffix}": false_negatives.ravel(),
+        f"precision{suffix}": precision.ravel(),
+        f"recall{suffix}": recall.ravel(),
+    })
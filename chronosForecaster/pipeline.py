@@ -0,0 +1,422 @@
+# Single entry point for the Chronos multiple-site pipeline: prepare -> fit -> backtest -> evaluate -> plot.
+# Every stage writes into .pipeline/<stage>/<key>/ where the key is a hash of the stage settings and of the
+# keys of the stages it reads from, so a stage is only rerun when one of its inputs changed.
+# Heavy libraries (autogluon, matplotlib) are imported inside the stages that need them.
+# `all` runs every stage and copies all outputs to the variant's folder, as multipleSite.py and
+# multipleSiteFineTuned.py do.
+#
+# Examples:
+#   python pipeline.py plot --variant base
+#   python pipeline.py evaluate --variant finetuned --test-end 2025-02-01
+#   PROFILE_OUTPUT=output-mul/profile.json python pipeline.py all --variant base
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+from profiling import Profiler
+
+PIPELINE_DIR = ".pipeline"
+COMPLETE_MARKER = ".complete"
+STAGES = ["prepare", "fit", "backtest", "evaluate", "plot"]
+# Written by the fit stage: the model-cache (or fleet-model) folder of the fitted predictor
+PREDICTOR_FILE = "predictor.json"
+
+# Predictor settings shared by both variants, besides the prediction length
+PREDICTOR = {"target": "site", "eval_metric": "MAE", "freq": "15min"}
+
+# Settings that differ between the base and fine-tuned Chronos runs
+VARIANTS = {
+    "base": {
+        "output_dir": "output-mul",
+        "fit": {"presets": "bolt_small", "time_limit": 1200},
+    },
+    "finetuned": {
+        "output_dir": "output-mul-FT",
+        "fit": {
+            "hyperparameters": {
+                "Chronos": [
+                    {
+                        "model_path": "bolt_small",
+                        "fine_tune": True,
+                        "ag_args": {"name_suffix": "FineTuned"}
+                    },
+                ]
+            },
+            "time_limit": 2400,
+            "enable_ensemble": False,
+        },
+    },
+}
+
+
+def file_digest(path):
+    """Returns the SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def autogluon_version():
+    """Returns the installed AutoGluon version without importing it, so cheap subcommands stay cheap."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("autogluon.timeseries")
+    except PackageNotFoundError:
+        return None
+
+
+def stage_key(stage, settings, upstream):
+    """Hashes a stage's settings together with the keys of the stages it reads from."""
+    payload = json.dumps({"stage": stage, "settings": settings, "upstream": upstream}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def run_stage(stage, key, build, force=False):
+    """Runs `build(stage_dir)` unless the stage output for this key already exists.
+
+    A folder without the completion marker is left over from an interrupted run and is handed back to
+    `build`, which decides whether to resume or start over.
+
+    Returns:
+        str: Folder holding the stage output.
+    """
+    stage_dir = os.path.join(PIPELINE_DIR, stage, key)
+    marker = os.path.join(stage_dir, COMPLETE_MARKER)
+    if os.path.exists(marker) and not force:
+        print(f"[{stage}] up to date ({stage_dir})")
+        return stage_dir
+    if force:
+        shutil.rmtree(stage_dir, ignore_errors=True)
+    os.makedirs(stage_dir, exist_ok=True)
+    print(f"[{stage}] running ({stage_dir})")
+    build(stage_dir)
+    with open(marker, "w") as f:
+        f.write(key)
+    return stage_dir
+
+
+class Pipeline:
+    """Computes the stage keys of one configuration and runs stages with their prerequisites."""
+
+    def __init__(self, args):
+        self.args = args
+        self.variant = VARIANTS[args.variant]
+        self.keys = {}
+        self.dirs = {}
+        # Opt-in: PROFILE_OUTPUT=<json> records a span per stage and per predict batch
+        self.profiler = Profiler.from_env()
+
+    def key(self, stage):
+        """Returns the key of a stage, computed from the settings and upstream keys only."""
+        if stage in self.keys:
+            return self.keys[stage]
+        from dataset import SITE_FILES
+        from forecast_store import STORE_FORMAT
+
+        args = self.args
+        if stage == "prepare":
+            settings = {"files": [(path, file_digest(path)) for path in SITE_FILES], "layout": "training_store"}
+            if args.mask_quality:
+                from data_quality import flag_bits, scan_settings
+
+                settings["quality"] = {"bits": flag_bits(args.mask_quality), "scan": scan_settings("site")}
+            key = stage_key(stage, settings, [])
+        elif stage == "fit":
+            # The predictor itself is cached by ModelCache, whose key also covers the AutoGluon version
+            settings = {
+                "predictor": self.predictor_kwargs(),
+                "fit": self.variant["fit"],
+                "autogluon": autogluon_version(),
+                "incremental": args.incremental,
+            }
+            key = stage_key(stage, settings, [self.key("prepare")])
+        elif stage == "backtest":
+            settings = {
+                "test_start": args.test_start,
+                "test_end": args.test_end,
+                "batch_size": args.batch_size,
+                "max_context_length": args.max_context_length,
+                "store_format": STORE_FORMAT,
+                "compact_store": args.compact_store,
+                **self.origin_settings(),
+            }
+            key = stage_key(stage, settings, [self.key("prepare"), self.key("fit")])
+        elif stage == "evaluate":
+            settings = {
+                "peak_quantile": args.peak_quantile,
+                "bootstrap_resamples": args.bootstrap_resamples,
+                "confidence": args.confidence,
+            }
+            key = stage_key(stage, settings, [self.key("prepare"), self.key("backtest")])
+        else:
+            key = stage_key(stage, {"max_points": args.max_points}, [self.key("evaluate")])
+        self.keys[stage] = key
+        return key
+
+    def predictor_kwargs(self):
+        """Returns the `TimeSeriesPredictor` settings of the run."""
+        return {**PREDICTOR, "prediction_length": self.args.prediction_length}
+
+    def predictor_path(self):
+        """Returns the folder of the fitted predictor, refitting if its model-cache entry was evicted."""
+        stage_dir = self.run("fit")
+        with open(os.path.join(stage_dir, PREDICTOR_FILE)) as f:
+            path = json.load(f)["path"]
+        if not os.path.isdir(path):
+            print(f"[fit] {path} was evicted, fitting again")
+            run_stage("fit", self.key("fit"), self.build_fit, force=True)
+            with open(os.path.join(stage_dir, PREDICTOR_FILE)) as f:
+                path = json.load(f)["path"]
+        return path
+
+    def origin_settings(self):
+        """Returns the origin selection options that are set, so exhaustive backtests keep their keys."""
+        options = {
+            "origin_stride": self.args.origin_stride,
+            "origin_times": self.args.origin_times,
+            "origins_per_stratum": self.args.origins_per_stratum,
+        }
+        options = {name: value for name, value in options.items() if value}
+        if options:
+            options["timezone"] = self.args.timezone
+        return options
+
+    def selected_origins(self):
+        """Returns the UTC origins of the backtest, or None to forecast every origin of the test window."""
+        if not self.origin_settings():
+            return None
+        from datetime import datetime
+
+        from origin_sampling import candidate_origins, sample_origins
+
+        candidates = candidate_origins(datetime.fromisoformat(self.args.test_start),
+                                       datetime.fromisoformat(self.args.test_end), self.args.prediction_length)
+        return sample_origins(candidates, stride=self.args.origin_stride, times_of_day=self.args.origin_times,
+                              per_stratum=self.args.origins_per_stratum, timezone=self.args.timezone)
+
+    def run(self, stage):
+        """Runs a stage after the stages it depends on, reusing every output that is up to date."""
+        if stage in self.dirs:
+            return self.dirs[stage]
+        build = getattr(self, f"build_{stage}")
+
+        def profiled_build(stage_dir):
+            with self.profiler.span(stage):
+                build(stage_dir)
+
+        force = self.args.force and self.args.stage in (stage, "all")
+        self.dirs[stage] = run_stage(stage, self.key(stage), profiled_build, force=force)
+        return self.dirs[stage]
+
+    def build_prepare(self, stage_dir):
+        from data_quality import flag_bits
+        from dataset import SITE_FILES
+        from training_store import build_training_store
+
+        # Masked intervals are missing for fit and backtest, and evaluate reads its actuals from this store too
+        build_training_store(os.path.join(stage_dir, "training_store"), SITE_FILES, target="site",
+                             quality_bits=flag_bits(self.args.mask_quality))
+
+    def build_fit(self, stage_dir):
+        from training_store import load_training_data
+
+        ts_data = load_training_data(os.path.join(self.run("prepare"), "training_store"), target="site")
+        if self.args.incremental:
+            from incremental_finetune import incremental_fine_tune
+
+            # Resumes from the last fine-tuned checkpoint in fleet-model/ on the data appended since then
+            predictor = incremental_fine_tune(
+                ts_data,
+                state_dir="fleet-model",
+                prediction_length=self.args.prediction_length,
+                replay_fraction=0.25,
+                time_limit=600,
+            )
+        else:
+            from model_cache import ModelCache
+
+            model_cache = ModelCache(self.args.model_cache, max_size_gb=20)
+            predictor = model_cache.get_or_fit(ts_data, predictor_kwargs=self.predictor_kwargs(),
+                                               fit_kwargs=self.variant["fit"])
+        with open(os.path.join(stage_dir, PREDICTOR_FILE), "w") as f:
+            json.dump({"path": predictor.path}, f)
+
+    def build_backtest(self, stage_dir):
+        from datetime import datetime
+
+        from autogluon.timeseries import TimeSeriesPredictor
+
+        from backtest import walk_forward
+        from forecast_log import ForecastLog
+        from forecast_store import ForecastStore
+        from metrics import OnlineEvaluator
+        from training_store import load_training_data, read_training_frame
+
+        training_store = os.path.join(self.run("prepare"), "training_store")
+        ts_data = load_training_data(training_store, target="site")
+        predictor = TimeSeriesPredictor.load(self.predictor_path())
+
+        # An interrupted backtest of the same key resumes from its log and store
+        forecast_log = ForecastLog(os.path.join(stage_dir, "walk_forward_log"), resume=True)
+
+        # Live per-step MAE/RMSE, updated as each batch lands and written to live_errors_by_step.csv
+        actual_df = read_training_frame(training_store, target="site").rename(columns={"site": "actual"})
+        actual_df["timestamp"] = actual_df["timestamp"].dt.tz_localize("UTC")
+        live_path = os.path.join(stage_dir, "live_errors_by_step.csv")
+        evaluator = OnlineEvaluator(actual_df, self.args.prediction_length, snapshot_path=live_path)
+        for part in forecast_log.iter_parts():
+            evaluator.update_frame(part)
+
+        with ForecastStore(os.path.join(stage_dir, "forecast_store"), resume=True,
+                           compact=self.args.compact_store) as forecast_store:
+            def on_batch(batch):
+                evaluator.update(batch)
+                forecast_store.append(batch)
+
+            walk_forward(
+                predictor,
+                ts_data,
+                datetime.fromisoformat(self.args.test_start),
+                datetime.fromisoformat(self.args.test_end),
+                self.args.prediction_length,
+                batch_size=self.args.batch_size,
+                max_context_length=self.args.max_context_length,
+                log=forecast_log,
+                on_batch=on_batch,
+                profiler=self.profiler,
+                selected_origins=self.selected_origins(),
+            )
+        evaluator.snapshot().to_csv(live_path, index=False)
+
+    def build_evaluate(self, stage_dir):
+        from datetime import datetime
+
+        from forecast_store import ForecastStore
+        from metrics import (average_forecast_by_timestamp, bootstrap_errors, errors_by_item, errors_by_step,
+                             gather_actuals)
+        from origin_sampling import candidate_origins, stratum_weights
+        from training_store import read_training_frame
+
+        actual_df = read_training_frame(os.path.join(self.run("prepare"), "training_store"), target="site")
+        actual_df["timestamp"] = actual_df["timestamp"].dt.tz_localize("UTC")
+        actual_df = actual_df.rename(columns={"site": "actual"})
+
+        forecast_store = ForecastStore(os.path.join(self.run("backtest"), "forecast_store"), resume=True)
+        chronos_tensor = forecast_store.to_tensor("mean")
+        chronos_actuals = gather_actuals(chronos_tensor, actual_df)
+        step_errors = errors_by_step(chronos_tensor, chronos_actuals, "chronos", peak_quantile=self.args.peak_quantile)
+        step_errors.to_csv(os.path.join(stage_dir, "errors_by_step_chronos.csv"), index=False)
+        errors_by_item(chronos_tensor, chronos_actuals, "chronos", peak_quantile=self.args.peak_quantile).to_csv(
+            os.path.join(stage_dir, "errors_by_item_chronos.csv"), index=False
+        )
+        average_forecast_by_timestamp(chronos_tensor, chronos_actuals).to_parquet(
+            os.path.join(stage_dir, "avg_forecasts.parquet"), index=False
+        )
+
+        # Sampled origins are weighted by how many candidate origins of their stratum they stand for
+        if self.args.bootstrap_resamples:
+            candidates = candidate_origins(datetime.fromisoformat(self.args.test_start),
+                                           datetime.fromisoformat(self.args.test_end), self.args.prediction_length)
+            weights = stratum_weights(chronos_tensor.origins, candidates, self.args.timezone)
+            bootstrap_errors(
+                chronos_tensor,
+                chronos_actuals,
+                "chronos",
+                weights=weights,
+                n_resamples=self.args.bootstrap_resamples,
+                confidence=self.args.confidence,
+                peak_quantile=self.args.peak_quantile,
+            ).to_csv(os.path.join(stage_dir, "errors_by_item_ci_chronos.csv"), index=False)
+
+    def build_plot(self, stage_dir):
+        import pandas as pd
+
+        from dataset import SITE_FILES
+        from report import render_report
+
+        evaluate_dir = self.run("evaluate")
+        step_errors = pd.read_csv(os.path.join(evaluate_dir, "errors_by_step_chronos.csv"))
+        avg_forecasts = pd.read_parquet(os.path.join(evaluate_dir, "avg_forecasts.parquet"))
+        render_report(step_errors, avg_forecasts, stage_dir, model_name="chronos", label="Chronos",
+                      color="blue", max_points=self.args.max_points, file_paths=SITE_FILES)
+
+    def export(self, stage):
+        """Copies the user-facing files of a finished stage to the variant's output folder."""
+        output_dir = self.variant["output_dir"]
+        os.makedirs(output_dir, exist_ok=True)
+        stage_dir = self.dirs[stage]
+        if stage == "backtest":
+            if os.path.exists(os.path.join(stage_dir, "live_errors_by_step.csv")):
+                shutil.copy(os.path.join(stage_dir, "live_errors_by_step.csv"), output_dir)
+        elif stage == "evaluate":
+            import pandas as pd
+
+            step_errors = pd.read_csv(os.path.join(stage_dir, "errors_by_step_chronos.csv"))
+            for item_id, errors in step_errors.groupby("item_id"):
+                errors.drop(columns="item_id").to_csv(
+                    os.path.join(output_dir, f"errors_by_target_chronos_item{item_id}.csv"), index=False
+                )
+            shutil.copy(os.path.join(stage_dir, "errors_by_item_chronos.csv"), output_dir)
+            if os.path.exists(os.path.join(stage_dir, "errors_by_item_ci_chronos.csv")):
+                shutil.copy(os.path.join(stage_dir, "errors_by_item_ci_chronos.csv"), output_dir)
+        elif stage == "plot":
+            for name in os.listdir(stage_dir):
+                if name.endswith(".png") or name == "index.html":
+                    shutil.copy(os.path.join(stage_dir, name), output_dir)
+        print(f"[{stage}] outputs in {stage_dir}")
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--variant", choices=sorted(VARIANTS), default="base", help="Base or fine-tuned Chronos")
+    common.add_argument("--prediction-length", type=int, default=96)
+    common.add_argument("--test-start", default="2025-01-01", help="First forecast origin (YYYY-MM-DD)")
+    common.add_argument("--test-end", default="2025-01-03", help="End of the test window (YYYY-MM-DD)")
+    common.add_argument("--batch-size", type=int, default=64, help="Contexts forecast per predict call")
+    common.add_argument("--max-context-length", type=int, default=2048)
+    common.add_argument("--origin-stride", default=None, help="Forecast only origins on this stride, e.g. 1h")
+    common.add_argument("--origin-times", nargs="+", default=None, help="Forecast only these local times, e.g. 06:00")
+    common.add_argument("--origins-per-stratum", type=int, default=None,
+                        help="Sample at most this many origins per month, weekday/weekend and peak/off-peak stratum")
+    common.add_argument("--timezone", default="America/Chicago", help="Local timezone of the origin options")
+    common.add_argument("--bootstrap-resamples", type=int, default=1000,
+                        help="Resamples of the metric confidence intervals, 0 to skip them")
+    common.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the metric intervals")
+    common.add_argument("--mask-quality", nargs="+", default=None,
+                        choices=["bad", "gap", "stuck", "out_of_range", "step_outlier"],
+                        help="Data-quality flags whose intervals are dropped from training and scoring")
+    common.add_argument("--peak-quantile", type=float, default=0.9, help="Quantile above which load is a peak")
+    common.add_argument("--max-points", type=int, default=5000, help="Points drawn in actual-vs-forecast plots")
+    common.add_argument("--compact-store", action="store_true",
+                        help="Store forecasts as compressed chunks with int8 quantiles instead of float32 arrays")
+    common.add_argument("--model-cache", default="model-cache", help="Folder of the cached predictors")
+    common.add_argument("--incremental", action="store_true",
+                        help="Fine-tune from the last fleet-model checkpoint on new data only (finetuned variant)")
+    common.add_argument("--force", action="store_true",
+                        help="Rerun the requested stage (every stage with `all`) even if it is up to date")
+
+    parser = argparse.ArgumentParser(description="Chronos multiple-site pipeline with memoized stages.")
+    subparsers = parser.add_subparsers(dest="stage", required=True)
+    for stage in STAGES:
+        subparsers.add_parser(stage, parents=[common], help=f"Run the {stage} stage and its prerequisites")
+    subparsers.add_parser("all", parents=[common], help="Run every stage and export all outputs")
+    args = parser.parse_args(argv)
+    if args.incremental and args.variant != "finetuned":
+        parser.error("--incremental only applies to the finetuned variant")
+
+    pipeline = Pipeline(args)
+    for stage in STAGES if args.stage == "all" else [args.stage]:
+        pipeline.run(stage)
+        pipeline.export(stage)
+    profile_path = pipeline.profiler.export()
+    if profile_path:
+        print(f"Stage timeline saved to {profile_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Opt-in stage profiling with named spans, exported as a JSON timeline."""
+import contextlib
+import fnmatch
+import json
+import os
+import resource
+import time
+import tracemalloc
+
+# Set to a JSON path to enable profiling, e.g. PROFILE_OUTPUT=output-mul/profile.json
+PROFILE_OUTPUT_ENV = "PROFILE_OUTPUT"
+# Span name (glob) whose allocations are traced with tracemalloc, e.g. PROFILE_TRACE="evaluate"
+PROFILE_TRACE_ENV = "PROFILE_TRACE"
+
+
+def get_rss_mb():
+    """Returns the resident set size of this process in MB.
+
+    Read from /proc on Linux. Elsewhere the peak RSS is returned, which still shows growth across spans.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 10**6
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB elsewhere
+        return peak / 10**6 if os.uname().sysname == "Darwin" else peak / 10**3
+
+
+class Profiler:
+    """Records wall time, CPU time and RSS of named spans.
+
+    A disabled profiler's spans do nothing, so scripts can keep their spans in place at no cost.
+    Allocation tracing is expensive and only runs inside the spans matching `trace`.
+    """
+
+    def __init__(self, output_path=None, trace=None, enabled=True):
+        """Inits a profiler.
+
+        Args:
+            output_path (Optional[str]): JSON file the timeline is written to by `export`.
+            trace (Optional[str]): Glob of the span names traced with tracemalloc, e.g. "predict batch".
+            enabled (bool): Record spans. If False, `span` is a no-op.
+        """
+        self.output_path = output_path
+        self.trace = trace
+        self.enabled = enabled
+        self.spans = []
+        self._stack = []
+        self._origin = time.perf_counter()
+
+    @classmethod
+    def from_env(cls):
+        """Creates a profiler that is enabled only when the PROFILE_OUTPUT environment variable is set."""
+        output_path = os.environ.get(PROFILE_OUTPUT_ENV)
+        return cls(output_path=output_path, trace=os.environ.get(PROFILE_TRACE_ENV), enabled=bool(output_path))
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """Measures the enclosed block as a span.
+
+        Args:
+            name (str): Stage name, e.g. "data load" or "predict batch".
+            **attributes: Extra values stored with the span, e.g. the batch size.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        traced = self.trace is not None and fnmatch.fnmatch(name, self.trace) and not tracemalloc.is_tracing()
+        if traced:
+            tracemalloc.start()
+        record = {"name": name, "parent": self._stack[-1] if self._stack else None, "depth": len(self._stack)}
+        record.update(attributes)
+        self._stack.append(name)
+        rss_start = get_rss_mb()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_end = time.perf_counter()
+            cpu_end = time.process_time()
+            rss_end = get_rss_mb()
+            self._stack.pop()
+            record.update({
+                "start_s": wall_start - self._origin,
+                "wall_s": wall_end - wall_start,
+                "cpu_s": cpu_end - cpu_start,
+                "rss_start_mb": rss_start,
+                "rss_end_mb": rss_end,
+                "rss_delta_mb": rss_end - rss_start,
+            })
+            if traced:
+                current, peak = tracemalloc.get_traced_memory()
+                top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+                tracemalloc.stop()
+                record["traced_current_mb"] = current / 10**6
+                record["traced_peak_mb"] = peak / 10**6
+                record["top_allocations"] = [
+                    {"location": str(stat.traceback[0]), "size_mb": stat.size / 10**6, "count": stat.count}
+                    for stat in top
+                ]
+            self.spans.append(record)
+
+    def summary(self):
+        """Returns the total wall and CPU time, call count and largest RSS delta of each span name."""
+        totals = {}
+        for record in self.spans:
+            total = totals.setdefault(record["name"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_rss_delta_mb": 0.0})
+            total["calls"] += 1
+            total["wall_s"] += record["wall_s"]
+            total["cpu_s"] += record["cpu_s"]
+            total["max_rss_delta_mb"] = max(total["max_rss_delta_mb"], record["rss_delta_mb"])
+        return totals
+
+    def export(self, output_path=None):
+        """Writes the spans, ordered by start time, and their summary to a JSON file.
+
+        Args:
+            output_path (Optional[str]): Overrides the path given at init.
+
+        Returns:
+            Optional[str]: Path written, None if the profiler is disabled or has no path.
+        """
+        output_path = output_path or self.output_path
+        if not self.enabled or not output_path:
+            return None
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w") as f:
+            json.dump({
+                "summary": self.summary(),
+                "spans": sorted(self.spans, key=lambda record: record["start_s"]),
+            }, f, indent=2)
+        return output_path
@@ -0,0 +1,140 @@
+"""Headless, process-parallel rendering of the per-item evaluation figures."""
+import html
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rollups import RAW_FREQ, choose_tier, query, select_tier
+
+
+def render_item(item_id, steps, mae, rmse, tier, actual, forecast, output_dir, model_name, label, color):
+    """Renders the MAE, RMSE and actual-vs-forecast figures of one item with the Agg backend.
+
+    Args:
+        item_id (Any): Item the figures are for.
+        steps (np.ndarray): Forecast steps.
+        mae (np.ndarray): MAE per step.
+        rmse (np.ndarray): RMSE per step.
+        tier (str): Rollup tier of `actual` and `forecast`: "raw", "hour", "day" or "month".
+        actual (pd.DataFrame): Actual load rows of the tier (timestamp, min, mean, max).
+        forecast (pd.DataFrame): Rows of the forecast averaged over origins, in the same tier.
+        output_dir (str): Folder the figures are written to.
+        model_name (str): Figure file prefix, e.g. "chronos".
+        label (str): Model name shown in titles and legends.
+        color (str): Line color of the model.
+
+    Returns:
+        List[str]: File names of the written figures, relative to `output_dir`.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    files = []
+    for metric, values in (("mae", mae), ("rmse", rmse)):
+        plt.figure(figsize=(12, 5))
+        plt.plot(steps, values, label=f'{label} {metric.upper()} - item {item_id}', color=color)
+        plt.xlabel("Forecast Step (15-min intervals)")
+        plt.ylabel(metric.upper())
+        plt.title(f"{label} {metric.upper()} by Forecast Step (Item {item_id})")
+        plt.legend()
+        plt.grid(True)
+        plt.tight_layout()
+        files.append(f"{model_name}_{metric}_item{item_id}.png")
+        plt.savefig(os.path.join(output_dir, files[-1]))
+        plt.close()
+
+    plt.figure(figsize=(14, 6))
+    suffix = "" if tier == "raw" else f" ({tier} mean)"
+    if tier != "raw":
+        # The band keeps the peaks and troughs the bucket means smooth out
+        plt.fill_between(actual["timestamp"], actual["min"], actual["max"], color='black', alpha=0.15,
+                         label=f'Actual ({tier} min-max)')
+    plt.plot(actual["timestamp"], actual["mean"], label=f'Actual{suffix}', color='black', linewidth=1.5)
+    plt.plot(forecast["timestamp"], forecast["mean"], label=f'{label} Forecast (avg){suffix}', color=color, alpha=0.7)
+    plt.title(f"Actual vs {label} Forecasted Values (Item {item_id})")
+    plt.xlabel("Timestamp")
+    plt.ylabel("Site Load")
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    files.append(f"{model_name}_actual_vs_forecast_item{item_id}.png")
+    plt.savefig(os.path.join(output_dir, files[-1]))
+    plt.close()
+    return files
+
+
+def render_report(step_errors, avg_forecasts, output_dir, model_name="chronos", label="Chronos", color="blue",
+                  num_workers=None, max_points=5000, file_paths=None):
+    """Renders the figures of every item in a process pool and writes an index page linking them.
+
+    Workers are spawned, so each starts without the caller's threads and library state, and the calling
+    script must be guarded by `if __name__ == "__main__":`.
+
+    Args:
+        step_errors (pd.DataFrame): Output of `metrics.errors_by_step`.
+        avg_forecasts (pd.DataFrame): Output of `metrics.average_forecast_by_timestamp`.
+        output_dir (str): Folder the figures and `index.html` are written to.
+        model_name (str): Metric column suffix and figure file prefix, e.g. "chronos".
+        label (str): Model name shown in titles and legends.
+        color (str): Line color of the model.
+        num_workers (Optional[int]): Number of worker processes. Defaults to the number of CPUs.
+        max_points (int): Maximum number of points drawn in the actual-vs-forecast figure. Longer ranges are
+            drawn from the finest `rollups` tier that stays under it.
+        file_paths (Optional[Sequence[str]]): Site CSV of every item_id. The actuals are then read from the
+            site's stored rollup tiers; otherwise they are aggregated from `avg_forecasts`.
+
+    Returns:
+        str: Path of the index page.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    item_ids = list(np.unique(step_errors["item_id"]))
+    jobs = []
+    for item_id in item_ids:
+        errors = step_errors[step_errors["item_id"] == item_id]
+        avg = avg_forecasts[avg_forecasts["item_id"] == item_id]
+        timestamps = pd.to_datetime(avg["timestamp"], utc=True)
+        start, end = timestamps.min(), timestamps.max() + pd.Timedelta(RAW_FREQ)
+        tier = choose_tier(start, end, max_points) if len(avg) else "raw"
+        if file_paths is not None and len(avg):
+            _, actual = query(file_paths[item_id], start, end, tier=tier)
+        else:
+            actual = select_tier(pd.DataFrame({"timestamp": timestamps, "value": avg["actual"].to_numpy()}), tier)
+        forecast = select_tier(pd.DataFrame({"timestamp": timestamps, "value": avg["forecast"].to_numpy()}), tier)
+        jobs.append((
+            item_id,
+            errors["step"].to_numpy(),
+            errors[f"mae_{model_name}"].to_numpy(),
+            errors[f"rmse_{model_name}"].to_numpy(),
+            tier,
+            actual,
+            forecast,
+            output_dir,
+            model_name,
+            label,
+            color,
+        ))
+
+    with ProcessPoolExecutor(
+        max_workers=min(num_workers or os.cpu_count() or 1, max(1, len(jobs))),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        files = list(executor.map(render_item, *zip(*jobs))) if jobs else []
+
+    sections = []
+    for item_id, item_files in zip(item_ids, files):
+        images = "\n".join(
+            f'<a href="{html.escape(name)}"><img src="{html.escape(name)}" width="600"></a>' for name in item_files
+        )
+        sections.append(f"<h2>Item {html.escape(str(item_id))}</h2>\n{images}")
+    index_path = os.path.join(output_dir, "index.html")
+    with open(index_path, "w") as f:
+        f.write(
+            f"<html><head><title>{html.escape(label)} report</title></head><body>\n"
+            f"<h1>{html.escape(label)} report</h1>\n" + "\n".join(sections) + "\n</body></html>\n"
+        )
+    return index_path
@@ -0,0 +1,222 @@
+"""Hourly, daily and monthly min/mean/max/sum rollups of site series, stored next to the Parquet cache."""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from dataset import ensure_cache, get_cache_path
+
+RAW_FREQ = "15min"
+# Tiers from finest to coarsest; each tier is built from the one before it
+TIERS = ["hour", "day", "month"]
+# Bucket width of each tier; the month width is only used to estimate the number of buckets of a range
+TIER_FREQS = {"raw": RAW_FREQ, "hour": "1h", "day": "1D", "month": "30D"}
+
+
+def get_rollup_path(file_path, tier, column="site"):
+    """Returns the rollup path of a site CSV tier, e.g. data/.cache/demoData-1year.site.day.parquet."""
+    return os.path.splitext(get_cache_path(file_path))[0] + f".{column}.{tier}.parquet"
+
+
+def get_meta_path(file_path, column="site"):
+    """Returns the path of the rollup metadata, which records what the stored tiers were built from."""
+    return os.path.splitext(get_cache_path(file_path))[0] + f".{column}.rollups.json"
+
+
+def bucket_starts(timestamps, tier):
+    """Returns the UTC start of the hour, day or month bucket of every timestamp."""
+    timestamps = pd.DatetimeIndex(timestamps)
+    if tier == "month":
+        return timestamps.tz_convert(None).to_period("M").start_time.tz_localize("UTC")
+    return timestamps.floor(TIER_FREQS[tier])
+
+
+def aggregate(df, tier):
+    """Aggregates raw values or a finer tier into `tier` buckets.
+
+    Args:
+        df (pd.DataFrame): Either raw rows (timestamp, value) or finer rollup rows (timestamp, count, min, max, sum).
+        tier (str): "hour", "day" or "month".
+
+    Returns:
+        pd.DataFrame: Columns timestamp (bucket start, UTC), count, min, mean, max and sum.
+    """
+    buckets = bucket_starts(df["timestamp"], tier)
+    if "value" in df:
+        grouped = df["value"].groupby(buckets)
+        rollup = pd.DataFrame({
+            "count": grouped.count(),
+            "min": grouped.min(),
+            "max": grouped.max(),
+            "sum": grouped.sum(),
+        })
+    else:
+        grouped = df.groupby(buckets)
+        rollup = pd.DataFrame({
+            "count": grouped["count"].sum(),
+            "min": grouped["min"].min(),
+            "max": grouped["max"].max(),
+            "sum": grouped["sum"].sum(),
+        })
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rollup.insert(2, "mean", rollup["sum"] / rollup["count"].where(rollup["count"] > 0))
+    rollup.index.name = "timestamp"
+    return rollup.reset_index()
+
+
+def _read_raw(cache_path, column, start=None, end=None):
+    filters = []
+    if start is not None:
+        filters.append(("timestamp", ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append(("timestamp", "<", pd.Timestamp(end)))
+    df = pd.read_parquet(cache_path, columns=["timestamp", column], filters=filters or None)
+    return df.rename(columns={column: "value"})
+
+
+def _content_hash(df):
+    """Returns an order-sensitive hash of the rows' content, so reordered or edited rows change it."""
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def _cutoff_meta(cache_path, column, hour_cutoff):
+    """Returns what `update_rollups` checks before reusing tiers built up to `hour_cutoff`.
+
+    Only the raw rows from the last complete hour onward are read: the number of rows before the cutoff comes
+    from the Parquet row count, and the last complete hour is hashed.
+    """
+    tail = _read_raw(cache_path, column, start=hour_cutoff - pd.Timedelta(TIER_FREQS["hour"]))
+    before = tail["timestamp"] < hour_cutoff
+    return {
+        "hour_cutoff": hour_cutoff.isoformat(),
+        "rows_before_cutoff": pq.ParquetFile(cache_path).metadata.num_rows - int((~before).sum()),
+        "hash_last_hour": _content_hash(tail[before]),
+    }, tail
+
+
+def build_tiers(raw):
+    """Aggregates an in-memory series into every tier, each built from the one before it.
+
+    Args:
+        raw (pd.DataFrame): Columns timestamp (UTC) and value, e.g. an averaged forecast.
+
+    Returns:
+        Dict[str, pd.DataFrame]: Rows of each tier, as stored by `update_rollups`.
+    """
+    tiers, finer = {}, raw
+    for tier in TIERS:
+        finer = tiers[tier] = aggregate(finer, tier)
+    return tiers
+
+
+def raw_rows(raw):
+    """Returns raw rows (timestamp, value) in the tier format: count 1 and min = mean = max = sum = the value."""
+    value = raw["value"]
+    return raw[["timestamp"]].assign(count=value.notna().astype(int), min=value, mean=value, max=value, sum=value)
+
+
+def select_tier(raw, tier):
+    """Returns the rows of an in-memory series in `tier`, as `query` does for a site series."""
+    return raw_rows(raw).reset_index(drop=True) if tier == "raw" else build_tiers(raw)[tier]
+
+
+def _write(df, path):
+    df.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+
+def update_rollups(file_path, column="site"):
+    """Builds or refreshes the rollup tiers of a site.
+
+    When the site data only grew since the last build, only the last bucket of each tier and the buckets after
+    it are recomputed, from the raw rows after the last hour bucket start. Only those rows and the hour before
+    them are read: the tiers are rebuilt in full if the number of earlier rows or the content of that last
+    complete hour changed. Edits further back that keep the row count are not detected by an update.
+
+    Args:
+        file_path (str): Path of the site CSV.
+        column (str): Column to roll up.
+
+    Returns:
+        Dict[str, str]: Rollup path of each tier.
+    """
+    cache_path = ensure_cache(file_path)
+    paths = {tier: get_rollup_path(file_path, tier, column) for tier in TIERS}
+    meta_path = get_meta_path(file_path, column)
+    meta = None
+    if os.path.exists(meta_path) and all(os.path.exists(path) for path in paths.values()):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    raw_mtime = os.path.getmtime(cache_path)
+    if meta is not None and meta["raw_mtime"] == raw_mtime:
+        return paths
+
+    incremental = False
+    if meta is not None and "rows_before_cutoff" in meta:
+        # The earlier raw rows must be unchanged for the stored tiers to be reused
+        checks, recent = _cutoff_meta(cache_path, column, pd.Timestamp(meta["hour_cutoff"]))
+        incremental = all(checks[key] == meta[key] for key in ("rows_before_cutoff", "hash_last_hour"))
+
+    finer = None
+    for tier in TIERS:
+        if incremental:
+            old = pd.read_parquet(paths[tier])
+            tier_cutoff = old["timestamp"].iloc[-1]
+            if finer is None:
+                source = recent[recent["timestamp"] >= tier_cutoff]
+            else:
+                source = finer[finer["timestamp"] >= tier_cutoff]
+            rollup = pd.concat([old[old["timestamp"] < tier_cutoff], aggregate(source, tier)], ignore_index=True)
+        else:
+            rollup = aggregate(_read_raw(cache_path, column) if finer is None else finer, tier)
+        _write(rollup, paths[tier])
+        if tier == "hour":
+            hour_cutoff = rollup["timestamp"].iloc[-1]
+        finer = rollup
+
+    meta = {"raw_mtime": raw_mtime, **_cutoff_meta(cache_path, column, hour_cutoff)[0]}
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+    return paths
+
+
+def choose_tier(start, end, max_points=5000):
+    """Returns the finest tier with at most `max_points` buckets between start and end."""
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for tier in ["raw", *TIERS]:
+        if span / pd.Timedelta(TIER_FREQS[tier]) <= max_points:
+            return tier
+    return TIERS[-1]
+
+
+def query(file_path, start, end, column="site", max_points=5000, tier=None):
+    """Reads a site series over [start, end) from the finest tier that keeps it under `max_points` points.
+
+    Args:
+        file_path (str): Path of the site CSV.
+        start (datetime): Start of the range (UTC if timezone-naive).
+        end (datetime): End of the range, exclusive.
+        column (str): Column to read.
+        max_points (int): Maximum number of rows to return when the tier is chosen automatically.
+        tier (Optional[str]): Force "raw", "hour", "day" or "month".
+
+    Returns:
+        Tuple[str, pd.DataFrame]: The tier used and its rows, with columns timestamp, count, min, mean, max
+            and sum. Raw rows have count 1 and min = mean = max = sum = the value.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    start = start.tz_localize("UTC") if start.tzinfo is None else start.tz_convert("UTC")
+    end = end.tz_localize("UTC") if end.tzinfo is None else end.tz_convert("UTC")
+    tier = tier or choose_tier(start, end, max_points)
+
+    if tier == "raw":
+        return tier, raw_rows(_read_raw(ensure_cache(file_path), column, start=start, end=end))
+
+    path = update_rollups(file_path, column)[tier]
+    df = pd.read_parquet(path, filters=[("timestamp", ">=", bucket_starts([start], tier)[0]),
+                                        ("timestamp", "<", end)])
+    return tier, df.reset_index(drop=True)
@@ -0,0 +1,96 @@
+# This script runs the walk-forward backtest of an already trained Chronos predictor across a process pool.
+# Train the predictor with multipleSite.py or multipleSiteFineTuned.py first and pass its folder with --predictor-path.
+# Origins can be thinned to a stride, fixed times of day or a stratified sample, as in pipeline.py and
+# baselineBacktest.py, and per-site errors are reported with bootstrap confidence intervals.
+import argparse
+import os
+import time
+from datetime import datetime
+
+from backtest import sharded_walk_forward
+from dataset import SITE_FILES, load_sites, load_ts_data
+from forecast_log import ForecastLog
+from forecast_store import ForecastStore
+from metrics import OnlineEvaluator, bootstrap_errors, gather_actuals
+from origin_sampling import candidate_origins, sample_origins, stratum_weights
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded walk-forward backtest of a trained Chronos predictor.")
+    parser.add_argument("--predictor-path", required=True, help="Folder of the trained TimeSeriesPredictor")
+    parser.add_argument("--output-dir", default="output-mul", help="Folder of the forecast store and live errors")
+    parser.add_argument("--test-start", default="2025-01-01", help="First forecast origin (YYYY-MM-DD)")
+    parser.add_argument("--test-end", default="2025-01-03", help="End of the test window (YYYY-MM-DD)")
+    parser.add_argument("--prediction-length", type=int, default=96)
+    parser.add_argument("--num-workers", type=int, default=None, help="Defaults to cpu_count // threads-per-worker")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--shard-size", type=int, default=512, help="(item, origin) pairs per shard")
+    parser.add_argument("--batch-size", type=int, default=64, help="Contexts forecast per predict call")
+    parser.add_argument("--max-context-length", type=int, default=2048)
+    parser.add_argument("--log-dir", default="output-mul/walk_forward_log", help="Folder of the append-only forecast log")
+    parser.add_argument("--resume", action="store_true", help="Skip (item, origin) pairs already in the log")
+    parser.add_argument("--compact-store", action="store_true",
+                        help="Store forecasts as compressed chunks with int8 quantiles instead of float32 arrays")
+    parser.add_argument("--origin-stride", default=None, help="Forecast only origins on this stride, e.g. 1h")
+    parser.add_argument("--origin-times", nargs="+", default=None, help="Forecast only these local times, e.g. 06:00")
+    parser.add_argument("--origins-per-stratum", type=int, default=None,
+                        help="Sample at most this many origins per month, weekday/weekend and peak/off-peak stratum")
+    parser.add_argument("--timezone", default="America/Chicago", help="Local timezone of the origin options")
+    parser.add_argument("--bootstrap-resamples", type=int, default=1000,
+                        help="Resamples of the metric confidence intervals, 0 to skip them")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the metric intervals")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    ts_data = load_ts_data(SITE_FILES)
+    print("Data prepared for Chronos.")
+    test_start_dt = datetime.fromisoformat(args.test_start)
+    test_end_dt = datetime.fromisoformat(args.test_end)
+    candidates = candidate_origins(test_start_dt, test_end_dt, args.prediction_length)
+    origins = sample_origins(candidates, stride=args.origin_stride, times_of_day=args.origin_times,
+                             per_stratum=args.origins_per_stratum, timezone=args.timezone)
+    print(f"{len(origins)} of {len(candidates)} origins selected.")
+
+    # Live per-step MAE/RMSE, updated as each shard lands
+    os.makedirs(args.output_dir, exist_ok=True)
+    live_errors_path = os.path.join(args.output_dir, "live_errors_by_step.csv")
+    actual_df = load_sites(SITE_FILES, columns=("site",)).rename(columns={"site": "actual"})
+    evaluator = OnlineEvaluator(actual_df, args.prediction_length, snapshot_path=live_errors_path)
+    forecast_log = ForecastLog(args.log_dir, resume=args.resume)
+    if args.resume:
+        for part in forecast_log.iter_parts():
+            evaluator.update_frame(part)
+    forecast_store = ForecastStore(os.path.join(args.output_dir, "forecast_store"), resume=args.resume,
+                                   compact=args.compact_store)
+
+    def on_batch(batch):
+        evaluator.update(batch)
+        forecast_store.append(batch)
+
+    with forecast_store:
+        sharded_walk_forward(
+            args.predictor_path,
+            ts_data,
+            test_start_dt,
+            test_end_dt,
+            args.prediction_length,
+            num_workers=args.num_workers,
+            threads_per_worker=args.threads_per_worker,
+            shard_size=args.shard_size,
+            batch_size=args.batch_size,
+            max_context_length=args.max_context_length,
+            log=forecast_log,
+            on_batch=on_batch,
+            selected_origins=origins,
+        )
+
+    evaluator.snapshot().to_csv(live_errors_path, index=False)
+    if args.bootstrap_resamples:
+        # Sampled origins are weighted by how many candidate origins of their stratum they stand for
+        tensor = forecast_store.to_tensor("mean")
+        weights = stratum_weights(tensor.origins, candidates, args.timezone)
+        bootstrap_errors(tensor, gather_actuals(tensor, actual_df), "chronos", weights=weights,
+                         n_resamples=args.bootstrap_resamples, confidence=args.confidence).to_csv(
+            os.path.join(args.output_dir, "errors_by_item_ci_chronos.csv"), index=False
+        )
+    print(f"Walk-forward forecasts saved to {forecast_store.directory}.")
+    print(f"Total script runtime: {time.time() - start_time:.2f} seconds")
@@ -0,0 +1,187 @@
+"""Shared timestamp parser: vectorized, one parse per distinct string, explicit DST resolution, int64 UTC epochs."""
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Epoch of values that could not be parsed, the integer value of pandas' NaT
+NAT = np.iinfo(np.int64).min
+
+# Tried after the format pandas guesses from the first value, e.g. for day-first dates it guessed month-first
+FALLBACK_FORMATS = [
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%Y-%m-%d",
+]
+
+# Number of characters of each numeric field read by the fixed-width parser
+FIXED_WIDTH_FIELDS = {"%Y": 4, "%m": 2, "%d": 2, "%H": 2, "%M": 2, "%S": 2}
+
+
+def detect_format(values, sample_size=100):
+    """Detects the strptime format of timestamp strings from an evenly spaced sample.
+
+    Args:
+        values (Sequence[str]): Timestamp strings, missing values are skipped.
+        sample_size (int): Number of strings checked against each candidate format.
+
+    Returns:
+        Optional[str]: First candidate format that parses every sampled string, or None.
+    """
+    strings = pd.Series(values, dtype=object).dropna().astype(str)
+    if strings.empty:
+        return None
+    sample = strings.iloc[np.linspace(0, len(strings) - 1, min(sample_size, len(strings))).astype(int)]
+    for fmt in dict.fromkeys([guess_datetime_format(sample.iloc[0]), *FALLBACK_FORMATS]):
+        if fmt is None:
+            continue
+        parsed = pd.to_datetime(sample, format=fmt, errors="coerce", utc="%z" in fmt)
+        if parsed.notna().all():
+            return fmt
+    return None
+
+
+def _fixed_width_layout(fmt):
+    """Splits a format into (directive, start, width) fields, or returns None if it is not fixed-width."""
+    fields, position, k = [], 0, 0
+    while k < len(fmt):
+        directive = fmt[k:k + 2]
+        if directive in FIXED_WIDTH_FIELDS:
+            fields.append((directive, position, FIXED_WIDTH_FIELDS[directive]))
+            position += FIXED_WIDTH_FIELDS[directive]
+            k += 2
+        elif directive == "%z" and k + 2 == len(fmt):
+            # Only the "+HH:MM" form, as written by pandas and most exports
+            fields.append((directive, position, 6))
+            position += 6
+            k += 2
+        elif fmt[k] == "%":
+            return None
+        else:
+            position += 1
+            k += 1
+    return fields, position
+
+
+def parse_fixed_width(strings, fmt):
+    """Parses strings of one fixed-width numeric format with array arithmetic on their characters.
+
+    Args:
+        strings (Sequence[str]): Timestamp strings without missing values.
+        fmt (str): strptime format made of %Y, %m, %d, %H, %M, %S, literal separators and an optional trailing
+            %z of the form +HH:MM.
+
+    Returns:
+        Optional[np.ndarray]: int64 epochs in nanoseconds (UTC for %z, wall time otherwise), `NAT` where a string
+            has non-digit fields or out-of-range values. None if the format or string lengths do not fit.
+    """
+    layout = _fixed_width_layout(fmt)
+    if layout is None:
+        return None
+    fields, width = layout
+    chars = np.asarray(strings, dtype=str)
+    if chars.dtype.itemsize != 4 * width or len(chars) == 0:
+        return None
+    codes = chars.view(np.uint32).reshape(len(chars), width)
+    if (codes == 0).any():
+        return None  # shorter strings are padded with NUL characters
+
+    valid = np.ones(len(chars), dtype=bool)
+    values = {}
+    for directive, start, size in fields:
+        if directive == "%z":
+            sign = np.where(codes[:, start] == ord("-"), -1, 1)
+            valid &= np.isin(codes[:, start], [ord("+"), ord("-")]) & (codes[:, start + 3] == ord(":"))
+            part = codes[:, [start + 1, start + 2, start + 4, start + 5]].astype(np.int64) - ord("0")
+            valid &= ((part >= 0) & (part <= 9)).all(axis=1)
+            values[directive] = sign * ((part[:, 0] * 10 + part[:, 1]) * 3600 + (part[:, 2] * 10 + part[:, 3]) * 60)
+            continue
+        # Only the characters of each field are converted, separators are never touched
+        part = codes[:, start:start + size].astype(np.int64) - ord("0")
+        valid &= ((part >= 0) & (part <= 9)).all(axis=1)
+        values[directive] = part @ (10 ** np.arange(size - 1, -1, -1))
+
+    year, month, day = values["%Y"], values.get("%m", 1), values.get("%d", 1)
+    hour, minute, second = values.get("%H", 0), values.get("%M", 0), values.get("%S", 0)
+    valid &= (month >= 1) & (month <= 12) & (hour < 24) & (minute < 60) & (second < 60)
+    month = np.clip(month, 1, 12)
+    month_start = (year - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (month - 1)
+    month_days = ((month_start + 1).astype("datetime64[D]") - month_start.astype("datetime64[D]")).astype(np.int64)
+    valid &= (day >= 1) & (day <= month_days)
+
+    days = month_start.astype("datetime64[D]").astype(np.int64) + day - 1
+    seconds = days * 86400 + hour * 3600 + minute * 60 + second - values.get("%z", 0)
+    return np.where(valid, seconds * 1_000_000_000, NAT)
+
+
+def _to_datetime(strings, fmt, utc):
+    """Parses distinct strings with the fixed-width parser when it applies, pandas otherwise."""
+    epochs = parse_fixed_width(strings, fmt) if fmt else None
+    if epochs is None:
+        return pd.DatetimeIndex(pd.to_datetime(strings, format=fmt or "mixed", errors="coerce", utc=utc))
+    parsed = pd.DatetimeIndex(epochs.view("datetime64[ns]"))
+    return parsed.tz_localize("UTC") if utc else parsed
+
+
+def parse_timestamps(values, timezone=None, format=None, ambiguous="raise", nonexistent="raise"):
+    """Parses timestamp strings to int64 UTC epochs in nanoseconds.
+
+    Each distinct string is parsed once, with one format detected up front, so repeated timestamps (e.g. one row
+    per zone and hour) cost a lookup. Strings with a UTC offset are converted with their own offset; the others
+    are wall times in `timezone`, whose DST transitions are resolved as requested rather than left to chance.
+
+    Args:
+        values (Sequence[str]): Timestamp strings.
+        timezone (Optional[str]): Timezone of strings without an offset, e.g. "America/New_York". UTC if None.
+        format (Optional[str]): strptime format, detected with `detect_format` if None.
+        ambiguous (Union[str, np.ndarray]): Wall times that occur twice when clocks fall back: "earliest" (the
+            DST reading), "latest" (the standard time reading), "NaT", "raise", or a boolean array aligned with
+            `values`, True where the time is DST (e.g. a "Time Zone" column equal to "EDT").
+        nonexistent (str): Wall times skipped when clocks spring forward: "shift_forward", "shift_backward",
+            "NaT" or "raise".
+
+    Returns:
+        np.ndarray: int64 UTC epochs in nanoseconds, `NAT` where a value is missing or could not be parsed.
+
+    Raises:
+        ValueError: If a wall time is ambiguous and `ambiguous` is "raise".
+    """
+    if not isinstance(values, (pd.Series, pd.Index)):
+        values = pd.Series(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    fmt = format or detect_format(uniques)
+    parsed = _to_datetime(uniques, fmt, utc=(fmt is not None and "%z" in fmt) or timezone is None)
+
+    if parsed.tz is not None:
+        epochs = parsed.as_unit("ns").asi8[codes]
+    else:
+        # Both readings of every distinct wall time; they differ only for ambiguous ones
+        dst = parsed.tz_localize(timezone, ambiguous=np.ones(len(parsed), dtype=bool), nonexistent=nonexistent)
+        standard = parsed.tz_localize(timezone, ambiguous=np.zeros(len(parsed), dtype=bool), nonexistent=nonexistent)
+        dst, standard = dst.as_unit("ns").asi8, standard.as_unit("ns").asi8
+        epochs = dst[codes]
+        is_ambiguous = (dst != standard)[codes]
+        if is_ambiguous.any():
+            if isinstance(ambiguous, str) and ambiguous == "raise":
+                raise ValueError(f"Ambiguous wall time {uniques[codes[is_ambiguous][0]]} in {timezone}")
+            if isinstance(ambiguous, str) and ambiguous == "latest":
+                epochs[is_ambiguous] = standard[codes[is_ambiguous]]
+            elif isinstance(ambiguous, str) and ambiguous == "NaT":
+                epochs[is_ambiguous] = NAT
+            elif not isinstance(ambiguous, str):
+                use_standard = is_ambiguous & ~np.asarray(ambiguous, dtype=bool)
+                epochs[use_standard] = standard[codes[use_standard]]
+
+    epochs[codes < 0] = NAT
+    return epochs
+
+
+def epochs_to_datetime(epochs, timezone="UTC"):
+    """Converts int64 UTC epochs in nanoseconds to a DatetimeIndex in `timezone`, with NaT for `NAT`."""
+    return pd.DatetimeIndex(pd.to_datetime(np.asarray(epochs, dtype=np.int64), unit="ns", utc=True)).tz_convert(timezone)
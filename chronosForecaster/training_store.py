@@ -0,0 +1,124 @@
+"""Partitioned Parquet training store, assembled one site at a time and read back into a single frame."""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_quality import mask_bad, scan_settings
+from dataset import SITE_FILES, load_site
+
+PARTITION_PREFIX = "item_id="
+PARTITION_FILE = "part-0.parquet"
+# Parquet schema metadata key of the quality masking a partition was written with
+QUALITY_KEY = b"quality"
+
+
+def get_partition_path(directory, item_id):
+    """Returns the Parquet file of an item, e.g. output-mul/training_store/item_id=3/part-0.parquet."""
+    return os.path.join(directory, f"{PARTITION_PREFIX}{item_id}", PARTITION_FILE)
+
+
+def list_partitions(directory):
+    """Returns (item_id, path) of every partition of a store, ordered by item_id."""
+    partitions = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name, PARTITION_FILE)
+        if name.startswith(PARTITION_PREFIX) and os.path.exists(path):
+            item_id = name[len(PARTITION_PREFIX):]
+            partitions.append((int(item_id) if item_id.isdigit() else item_id, path))
+    return sorted(partitions, key=lambda partition: (isinstance(partition[0], str), partition[0]))
+
+
+def build_training_store(directory, file_paths=SITE_FILES, target="site", quality_bits=0, **scan_kwargs):
+    """Streams the normalized series of every site into a partitioned Parquet store.
+
+    Only one site is held in memory at a time, and sites whose partition is newer than their CSV and was written
+    with the same quality masking are skipped, so a growing fleet only pays for new or changed sites. Partitions
+    of item ids beyond `file_paths` are removed.
+
+    Args:
+        directory (str): Folder of the store.
+        file_paths (Sequence[str]): Paths of the site CSVs, the position becomes the item_id.
+        target (str): Column stored as the target.
+        quality_bits (int): `data_quality` bits whose intervals are stored as NaN, so Chronos treats them as
+            missing and the metrics skip them. Nothing is masked if 0.
+        **scan_kwargs: Grid frequency and thresholds of the quality scan.
+
+    Returns:
+        str: `directory`.
+    """
+    quality = json.dumps({"bits": quality_bits, "scan": scan_settings(target, **scan_kwargs)}) if quality_bits else ""
+    os.makedirs(directory, exist_ok=True)
+    for item_id, file_path in enumerate(file_paths):
+        path = get_partition_path(directory, item_id)
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(file_path):
+            schema = pq.read_schema(path)
+            written_with = (schema.metadata or {}).get(QUALITY_KEY, b"").decode()
+            if schema.names == ["timestamp", target] and written_with == quality:
+                continue
+        df = load_site(file_path, columns=(target,), naive=True)
+        if quality_bits:
+            df = mask_bad(df, file_path, quality_bits, column=target, **scan_kwargs)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), QUALITY_KEY: quality.encode()})
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        del df, table
+
+    for item_id, path in list_partitions(directory):
+        if not isinstance(item_id, int) or item_id >= len(file_paths):
+            shutil.rmtree(os.path.dirname(path))
+    return directory
+
+
+def read_training_frame(directory, target="site"):
+    """Reads a store into one long frame, filling preallocated arrays partition by partition.
+
+    The row counts come from the Parquet footers, so the final arrays are allocated once and each partition
+    is released after it is copied in; peak memory is the output plus one site.
+
+    Args:
+        directory (str): Folder of the store.
+        target (str): Target column.
+
+    Returns:
+        pd.DataFrame: `item_id`, timezone-naive UTC `timestamp` and `target`, ordered by item_id.
+    """
+    partitions = list_partitions(directory)
+    counts = [pq.ParquetFile(path).metadata.num_rows for _, path in partitions]
+    total = sum(counts)
+    item_ids = np.repeat([item_id for item_id, _ in partitions], counts) if partitions else np.array([], dtype=int)
+    timestamps = np.empty(total, dtype="datetime64[ns]")
+    values = np.empty(total, dtype=np.float64)
+
+    offset = 0
+    for (_, path), count in zip(partitions, counts):
+        table = pq.read_table(path, columns=["timestamp", target])
+        timestamps[offset:offset + count] = table.column("timestamp").to_numpy().astype("datetime64[ns]")
+        values[offset:offset + count] = table.column(target).to_numpy()
+        offset += count
+        del table
+
+    return pd.DataFrame({"item_id": item_ids, "timestamp": timestamps, target: values}, copy=False)
+
+
+def load_training_data(directory, target="site"):
+    """Loads a store as a TimeSeriesDataFrame, without an intermediate concat or text copy.
+
+    Args:
+        directory (str): Folder of the store.
+        target (str): Target column.
+
+    Returns:
+        TimeSeriesDataFrame: Target series of every item in the store.
+    """
+    from autogluon.timeseries import TimeSeriesDataFrame
+
+    df = read_training_frame(directory, target)
+    index = pd.MultiIndex.from_arrays([df.pop("item_id"), df.pop("timestamp")], names=["item_id", "timestamp"])
+    return TimeSeriesDataFrame(pd.DataFrame({target: df[target].to_numpy()}, index=index, copy=False))